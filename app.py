@@ -7,7 +7,6 @@ from urllib.parse import parse_qs
 from flask import Flask, render_template, send_from_directory, request, jsonify, g
 from werkzeug.wrappers import Response
 from flask_socketio import SocketIO
-from psycopg2 import extras
 
 from config import get_config
 from auth_utils import (
@@ -17,8 +16,9 @@ from auth_utils import (
     serialize_user,
     invalidate_token
 )
-from models.user import User, get_db_connection, release_db_connection, init_database
+from models.user import User, db_cursor, init_database
 from sockets import register_lobby_events, register_game_events, register_chat_events
+from sockets import json_codec
 
 # Setup logging
 logging.basicConfig(
@@ -51,7 +51,8 @@ socketio = SocketIO(
     cors_allowed_origins=app.config.get('CORS_ALLOWED_ORIGINS', '*'),
     async_mode='threading',
     allow_upgrades=False,
-    transports=['polling']
+    transports=['polling'],
+    json=json_codec
 )
 
 app.wsgi_app = _BlockWebSocketTransport(app.wsgi_app)
@@ -90,8 +91,10 @@ def serve_static(filepath):
 
 @app.route('/uploads/avatars/<path:filepath>')
 def serve_avatars(filepath):
-    """Serve user uploaded avatars."""
-    return send_from_directory('uploads/avatars', filepath)
+    """Serve user uploaded avatars (content-addressed, so never stale)."""
+    response = send_from_directory('uploads/avatars', filepath, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 
 # ==================== Auth Helpers ====================
@@ -211,6 +214,26 @@ def api_user_games():
     return jsonify({'success': True, 'games': games})
 
 
+@app.route('/api/user/profile', methods=['GET'])
+@_require_auth(allow_guest=False)
+def api_user_profile():
+    """User, stats and recent games in a single round-trip."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = max(1, min(limit, 50))
+    profile = User.load_profile(g.current_user.id, limit=limit)
+    if not profile:
+        return jsonify({'success': False, 'error': 'Utente non trovato'}), 404
+    return jsonify({
+        'success': True,
+        'user': serialize_user(profile['user'], False),
+        'stats': profile['stats'],
+        'games': profile['games']
+    })
+
+
 @app.route('/api/user/avatar', methods=['POST'])
 @_require_auth(allow_guest=False)
 def api_user_avatar():
@@ -248,14 +271,12 @@ def api_leaderboard():
 
     order_map = {
         'wins': 's.games_won DESC, s.games_played DESC',
-        'win_rate': 'win_rate DESC, s.games_played DESC',
+        'win_rate': 's.win_rate DESC, s.games_played DESC',
         'streak': 's.best_streak DESC, s.games_played DESC'
     }
     order_by = order_map.get(category, order_map['wins'])
 
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
+    with db_cursor() as (conn, cursor):
         cursor.execute(f'''
             SELECT 
                 u.username,
@@ -264,10 +285,7 @@ def api_leaderboard():
                 s.games_won,
                 s.games_lost,
                 s.best_streak,
-                CASE 
-                    WHEN s.games_played > 0 THEN ROUND((s.games_won * 100.0) / s.games_played, 1)
-                    ELSE 0
-                END AS win_rate
+                s.win_rate
             FROM users u
             JOIN user_stats s ON s.user_id = u.id
             WHERE u.is_active = TRUE
@@ -275,8 +293,6 @@ def api_leaderboard():
             LIMIT %s
         ''', (limit,))
         rows = cursor.fetchall()
-    finally:
-        release_db_connection(conn)
 
     leaderboard = []
     for idx, row in enumerate(rows):
@@ -305,15 +321,23 @@ def admin_cleanup():
         return jsonify({'error': 'Unauthorized'}), 401
     
     from rooms.room_manager import room_manager
-    deleted_count = room_manager.cleanup_stale_rooms()
+    with room_manager.lock:
+        deleted_count = room_manager.cleanup_stale_rooms()
+        remaining = len(room_manager.rooms)
     
     return jsonify({
         'success': True,
         'deleted_rooms': deleted_count,
-        'remaining_rooms': len(room_manager.rooms)
+        'remaining_rooms': remaining
     })
 
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and indexes."""
+    init_database(force=True)
+
+
 # ==================== Main ====================
 
 if __name__ == '__main__':
@@ -2,6 +2,8 @@
 Card class for Presina game.
 Uses Neapolitan cards: 40 cards, 4 suits, values 1-10.
 """
+from typing import Optional
+
 
 class Card:
     # Suits in order of strength (Bastoni < Spade < Coppe < Ori)
@@ -21,6 +23,8 @@ class Card:
         10: 'Re'
     }
     
+    __slots__ = ('suit', 'value', '_jolly_choice', '_strength', '_dict_cache')
+    
     def __init__(self, suit: str, value: int):
         """
         Create a card.
@@ -37,6 +41,8 @@ class Card:
         self.suit = suit
         self.value = value
         self._jolly_choice = None  # 'prende' or 'lascia' for Asso di Ori
+        self._strength: Optional[int] = None  # Memoized get_strength() result
+        self._dict_cache: Optional[dict] = None  # Memoized to_dict() result
     
     @property
     def is_jolly(self) -> bool:
@@ -56,15 +62,31 @@ class Card:
         if choice not in ('prende', 'lascia'):
             raise ValueError("Choice must be 'prende' or 'lascia'")
         self._jolly_choice = choice
+        self._strength = None  # Strength depends on the choice
+        self._dict_cache = None
+    
+    def reset(self):
+        """Clear the jolly choice so the card can be dealt again."""
+        if self._jolly_choice is not None:
+            self._jolly_choice = None
+            self._strength = None
+            self._dict_cache = None
     
     def get_strength(self) -> int:
         """
-        Calculate card strength for comparison.
+        Get card strength for comparison (memoized).
         
         Normal cards: suit_index * 10 + value (0-39)
         Jolly with 'prende': 50 (beats everything including Re di Ori=39)
         Jolly with 'lascia': -1 (loses to everything)
         """
+        strength = self._strength
+        if strength is None:
+            strength = self._strength = self._compute_strength()
+        return strength
+    
+    def _compute_strength(self) -> int:
+        """Calculate card strength (see get_strength)."""
         if self.is_jolly and self._jolly_choice:
             if self._jolly_choice == 'prende':
                 return 50
@@ -84,16 +106,22 @@ class Card:
         return f"{self.VALUE_NAMES[self.value]} di {self.suit}"
     
     def to_dict(self) -> dict:
-        """Serialize card for JSON transmission."""
-        return {
-            'suit': self.suit,
-            'value': self.value,
-            'display_name': self.display_name,
-            'image_path': self.image_path(),
-            'is_jolly': self.is_jolly,
-            'jolly_choice': self._jolly_choice,
-            'strength': self.get_strength() if self._jolly_choice or not self.is_jolly else None
-        }
+        """
+        Serialize card for JSON transmission.
+        The dict is memoized and shared between calls, so callers must not mutate it.
+        """
+        data = self._dict_cache
+        if data is None:
+            data = self._dict_cache = {
+                'suit': self.suit,
+                'value': self.value,
+                'display_name': self.display_name,
+                'image_path': self.image_path(),
+                'is_jolly': self.is_jolly,
+                'jolly_choice': self._jolly_choice,
+                'strength': self.get_strength() if self._jolly_choice or not self.is_jolly else None
+            }
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Card':
@@ -10,15 +10,16 @@ from .card import Card
 class Deck:
     def __init__(self):
         """Create a new shuffled deck of 40 Neapolitan cards."""
+        # The same Card objects are dealt every turn, keeping their memoized data
+        self._pool: List[Card] = [Card(suit, value) for suit in Card.SUITS for value in range(1, 11)]
         self.cards: List[Card] = []
         self.reset()
     
     def reset(self):
         """Reset and shuffle the deck."""
-        self.cards = []
-        for suit in Card.SUITS:
-            for value in range(1, 11):
-                self.cards.append(Card(suit, value))
+        for card in self._pool:
+            card.reset()
+        self.cards = list(self._pool)
         self.shuffle()
     
     def shuffle(self):
@@ -42,9 +43,26 @@ class Deck:
             raise ValueError(f"Not enough cards in deck. Requested: {count}, Available: {len(self.cards)}")
         
         drawn = self.cards[:count]
-        self.cards = self.cards[count:]
+        del self.cards[:count]
         return drawn
     
+    def deal(self, hands: int, count: int) -> List[List[Card]]:
+        """
+        Draw several hands at once.
+        
+        Args:
+            hands: Number of hands to deal
+            count: Cards per hand
+            
+        Returns:
+            List of hands, each a list of `count` cards
+            
+        Raises:
+            ValueError: If not enough cards in deck
+        """
+        drawn = self.draw(hands * count)
+        return [drawn[i:i + count] for i in range(0, len(drawn), count)]
+    
     def __len__(self):
         return len(self.cards)
     
@@ -2,13 +2,30 @@
 Player class for Presina game.
 """
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from .card import Card
 
+# Attributes whose value appears in to_dict() output; writing any other attribute
+# (sid, last_activity, ...) keeps the cached dicts. is_online and last_activity only
+# feed display_online, which is part of the cache key.
+_DICT_FIELDS = frozenset((
+    'name', 'lives', 'bet', 'tricks_won', '_hand', 'is_away', 'is_spectator',
+    'join_next_turn', 'ready_for_next_turn', 'is_bot', 'is_lobby_away',
+))
+
 
 class Player:
     INITIAL_LIVES = 5
     
+    __slots__ = (
+        'player_id', 'name', 'sid', 'user_id', 'is_guest',
+        'lives', '_hand', '_hand_map', 'bet', 'tricks_won',
+        'total_tricks_won', 'total_bets_correct', 'total_bets_wrong', 'total_lives_lost',
+        'is_online', 'offline_since', 'is_away', 'away_since', 'last_activity',
+        'is_spectator', 'join_next_turn', 'ready_for_next_turn', 'is_bot', 'is_lobby_away',
+        '_dict_cache',
+    )
+    
     def __init__(self, player_id: str, name: str, sid: str = None, user_id: Optional[int] = None, is_guest: bool = False):
         """
         Create a player.
@@ -26,7 +43,7 @@ class Player:
         self.user_id = user_id
         self.is_guest = is_guest
         self.lives = self.INITIAL_LIVES
-        self.hand: List[Card] = []
+        self.hand = []  # Also builds _hand_map (see the hand property)
         self.bet: Optional[int] = None
         self.tricks_won = 0
         self.total_tricks_won = 0
@@ -34,7 +51,7 @@ class Player:
         self.total_bets_wrong = 0
         self.total_lives_lost = 0
         self.is_online = True
-        self.offline_since = None  # Timestamp when marked offline (socket disconnected)
+        self.offline_since = None  # time.monotonic() when marked offline (socket disconnected)
         self.is_away = False       # True if user switched tab/minimized (Page Visibility API)
         self.away_since = None     # Timestamp when marked away
         self.last_activity = time.time()  # Last ping/activity timestamp
@@ -44,6 +61,22 @@ class Player:
         self.is_bot = False  # True when player abandoned and bot plays for them
         self.is_lobby_away = False  # True when player went to lobby during game
     
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _DICT_FIELDS:
+            object.__setattr__(self, '_dict_cache', None)
+    
+    @property
+    def hand(self) -> List[Card]:
+        """Cards in hand, in the order they were dealt."""
+        return self._hand
+    
+    @hand.setter
+    def hand(self, cards: List[Card]):
+        self._hand = cards
+        # (suit, value) -> card, for O(1) lookups when a card is played
+        self._hand_map: Dict[Tuple[str, int], Card] = {(c.suit, c.value): c for c in cards}
+    
     def reset_for_turn(self):
         """Reset player state for a new turn."""
         self.hand = []
@@ -68,21 +101,19 @@ class Player:
         Raises:
             ValueError: If card not in hand
         """
-        if card not in self.hand:
+        if self._hand_map.pop((card.suit, card.value), None) is None:
             raise ValueError(f"Card {card} not in hand")
-        self.hand.remove(card)
+        self._hand.remove(card)
+        self._dict_cache = None
         return card
     
     def has_card(self, suit: str, value: int) -> bool:
         """Check if player has a specific card."""
-        return any(c.suit == suit and c.value == value for c in self.hand)
+        return (suit, value) in self._hand_map
     
     def get_card(self, suit: str, value: int) -> Optional[Card]:
         """Get a specific card from hand."""
-        for card in self.hand:
-            if card.suit == suit and card.value == value:
-                return card
-        return None
+        return self._hand_map.get((suit, value))
     
     def make_bet(self, bet: int, max_cards: int):
         """
@@ -137,10 +168,20 @@ class Player:
         Args:
             include_hand: Include full hand info (for the player themselves)
             others_hand_visible: Include hand info for special turn (1 card)
+        
+        The result is cached until the player changes and shared between
+        callers, so it must not be modified.
         """
         # For UI: show as 'online' if effectively online, or show 'away' status
         display_online = self.is_effectively_online
         
+        key = (include_hand, others_hand_visible, display_online)
+        cache = self._dict_cache
+        if cache is None:
+            cache = self._dict_cache = {}
+        elif key in cache:
+            return cache[key]
+        
         data = {
             'player_id': self.player_id,
             'name': self.name,
@@ -164,6 +205,7 @@ class Player:
             # Special turn: show hand to others
             data['hand'] = [card.to_dict() for card in self.hand]
         
+        cache[key] = data
         return data
     
     def __repr__(self):
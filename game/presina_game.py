@@ -10,8 +10,10 @@ Game rules:
 - End of turn: correct bet = no life lost, wrong bet = -1 life
 - Special round repeat: if everyone is correct in the 1-card round, it repeats until someone is wrong
 """
-from typing import List, Dict, Optional, Tuple
+from typing import Any, Callable, Deque, List, Dict, Optional, Tuple
+from collections import deque
 from enum import Enum
+from operator import attrgetter
 import time
 
 from .card import Card
@@ -29,16 +31,43 @@ class GamePhase(Enum):
     GAME_OVER = "game_over"       # Game finished
 
 
+# Phases in which cards are being played on the table
+_PLAY_PHASES = frozenset((GamePhase.PLAYING, GamePhase.WAITING_JOLLY))
+# Phases in which a special turn shows the other players' cards
+_OTHERS_HAND_PHASES = frozenset((GamePhase.BETTING, GamePhase.PLAYING))
+
+
 class PresinaGameOnline:
     CARDS_PER_TURN = [5, 4, 3, 2, 1]
+    LAST_TURN_INDEX = len(CARDS_PER_TURN) - 1  # the 1-card turn, repeated until someone errs
     MIN_PLAYERS = 2
     MAX_PLAYERS = 8
     TURN_TIMEOUT_SECONDS = 30
+    TRICK_DISPLAY_SECONDS = 3  # How long a completed trick stays on the table
+    MAX_MESSAGES = 100  # Game messages kept (oldest dropped first)
+    STATE_MESSAGES = 20  # Latest messages sent with each state
+    RESYNC = 'RESYNC'  # Returned when a client acts on a stale session_seq
     
-    def __init__(self, room_id: str):
+    __slots__ = (
+        'room_id', 'players', 'player_order', '_active_players_cache', '_active_index', 'deck',
+        'phase', '_current_turn', '_cards_this_turn', '_is_special_turn', 'current_trick', 'current_player_index',
+        'first_better_index', 'trick_starter_index',
+        'bets_made', '_bets_total', 'cards_on_table', '_cards_on_table_serialized', 'last_trick_cards', 'pending_jolly_player',
+        'trick_winner_id', 'trick_winner_card', 'is_last_trick_of_turn', 'trick_complete_deadline',
+        'turn_results', 'game_results', 'last_turn_all_correct',
+        'messages', '_recent_messages', '_msg_counter', '_now',
+        'turn_timer_deadline', 'turn_timer_player_id', 'turn_timer_type',
+        '_turn_timer_wall_deadline', '_turn_timer_view',
+        'scheduler', '_timer_handle', '_trick_handle',
+        'session_seq',
+    )
+    
+    def __init__(self, room_id: str, scheduler: Optional[Callable] = None):
         self.room_id = room_id
         self.players: Dict[str, Player] = {}  # player_id -> Player
         self.player_order: List[str] = []     # Order of play
+        self._active_players_cache: Optional[List[Player]] = None  # See get_active_players
+        self._active_index: Optional[Dict[str, int]] = None  # player_id -> index in active players
         self.deck = Deck()
         
         self.phase = GamePhase.WAITING
@@ -48,24 +77,42 @@ class PresinaGameOnline:
         self.first_better_index = 0           # Who bets first this turn
         self.trick_starter_index = 0          # Who starts the current trick
         
-        self.bets_made: List[str] = []        # player_ids in betting order
+        self.bets_made: Dict[str, int] = {}   # player_id -> bet, in betting order
+        self._bets_total: int = 0             # Sum of the bets in bets_made
         self.cards_on_table: List[Tuple[str, Card]] = []  # (player_id, card)
+        self._cards_on_table_serialized: Optional[list] = None  # Cached to_dict() of cards_on_table
         self.last_trick_cards: List[Tuple[str, Card]] = []  # Cards from last completed trick
         self.pending_jolly_player: Optional[str] = None   # Waiting for jolly choice
         self.trick_winner_id: Optional[str] = None        # Winner of last completed trick
+        self.trick_winner_card: Optional[Card] = None     # Card that won it
         self.is_last_trick_of_turn: bool = False          # Was this the last trick of the turn?
+        self.trick_complete_deadline: Optional[float] = None  # When TRICK_COMPLETE auto-advances (monotonic)
         
         self.turn_results: List[dict] = []    # Results for current turn
         self.game_results: List[dict] = []    # Final standings
         self.last_turn_all_correct: bool = False  # Track if last turn had no mistakes
         
-        self.messages: List[dict] = []        # Game event messages
-        self._last_offline_check: float = 0   # Last time we checked for offline players
+        self.messages: Deque[dict] = deque(maxlen=self.MAX_MESSAGES)  # Game event messages
+        self._recent_messages: Deque[dict] = deque(maxlen=self.STATE_MESSAGES)  # Tail of messages for the state
+        self._msg_counter: int = 0            # Seq of the last message added
+        self._now: Optional[float] = None     # Wall clock frozen for the duration of tick()
 
-        # Turn timer (betting/playing/jolly)
+        # Turn timer (betting/playing/jolly); deadlines use time.monotonic()
         self.turn_timer_deadline: Optional[float] = None
         self.turn_timer_player_id: Optional[str] = None
         self.turn_timer_type: Optional[str] = None  # 'betting' | 'playing' | 'jolly'
+        self._turn_timer_wall_deadline: Optional[float] = None  # Same deadline in time.time(), for clients
+        self._turn_timer_view: Optional[Tuple[tuple, dict]] = None  # (key, dict) cached for the state
+        
+        # Optional scheduler(delay, callback) -> handle with cancel().
+        # When set, the turn timer fires _on_timer_expire instead of being polled by tick().
+        self.scheduler: Optional[Callable[[float, Callable[[], bool]], Any]] = scheduler
+        self._timer_handle: Any = None
+        # Trick display timer, kept apart so turn timer syncs don't cancel it
+        self._trick_handle: Any = None
+
+        # Bumped on every state mutation; clients echo it back with their actions
+        self.session_seq: int = 0
     
     # ==================== Player Management ====================
     
@@ -79,6 +126,7 @@ class PresinaGameOnline:
         
         self.players[player.player_id] = player
         self.player_order.append(player.player_id)
+        self._invalidate_active_cache()
         return True
     
     def remove_player(self, player_id: str) -> bool:
@@ -89,6 +137,7 @@ class PresinaGameOnline:
         if player_id in self.players:
             del self.players[player_id]
             self.player_order.remove(player_id)
+            self._invalidate_active_cache()
             return True
         return False
 
@@ -98,8 +147,11 @@ class PresinaGameOnline:
             return False
 
         # Remove references first
-        self.bets_made = [pid for pid in self.bets_made if pid != player_id]
-        self.cards_on_table = [(pid, card) for pid, card in self.cards_on_table if pid != player_id]
+        removed_bet = self.bets_made.pop(player_id, None)
+        if removed_bet is not None:
+            self._bets_total -= removed_bet
+        self.cards_on_table[:] = [(pid, card) for pid, card in self.cards_on_table if pid != player_id]
+        self._cards_on_table_serialized = None
         self.last_trick_cards = [(pid, card) for pid, card in self.last_trick_cards if pid != player_id]
 
         if self.pending_jolly_player == player_id:
@@ -109,11 +161,13 @@ class PresinaGameOnline:
 
         if self.trick_winner_id == player_id:
             self.trick_winner_id = None
+            self.trick_winner_card = None
 
         # Remove player from game
         del self.players[player_id]
         if player_id in self.player_order:
             self.player_order.remove(player_id)
+        self._invalidate_active_cache()
 
         # Recompute indices to keep them in range
         active = self.get_active_players()
@@ -130,10 +184,11 @@ class PresinaGameOnline:
         if self.phase == GamePhase.BETTING:
             if active and len(self.bets_made) >= len(active):
                 self._start_playing()
-        elif self.phase in (GamePhase.PLAYING, GamePhase.WAITING_JOLLY):
+        elif self.phase in _PLAY_PHASES:
             if active and len(self.cards_on_table) >= len(active):
                 self._resolve_trick()
 
+        self.session_seq += 1
         self._sync_turn_timer()
         return True
     
@@ -142,14 +197,42 @@ class PresinaGameOnline:
         return self.players.get(player_id)
     
     def get_active_players(self) -> List[Player]:
-        """Get all active (non-spectator, non-eliminated) players."""
-        return [
-            self.players[pid] for pid in self.player_order
-            if pid in self.players 
-            and not self.players[pid].is_spectator
-            and not self.players[pid].is_eliminated
-            and not self.players[pid].join_next_turn
-        ]
+        """
+        Get all active (non-spectator, non-eliminated) players.
+        
+        The list is cached and shared, so callers must not modify it. Call
+        _invalidate_active_cache() after changing players/player_order or a
+        player's lives, is_spectator or join_next_turn.
+        """
+        active = self._active_players_cache
+        if active is None:
+            players = self.players
+            active = [
+                p for pid in self.player_order
+                if (p := players.get(pid)) is not None
+                and not p.is_spectator
+                and not p.is_eliminated
+                and not p.join_next_turn
+            ]
+            self._active_players_cache = active
+        return active
+    
+    def active_count(self) -> int:
+        """Number of active players (see get_active_players)."""
+        return len(self.get_active_players())
+    
+    def _get_active_index(self) -> Dict[str, int]:
+        """Map player_id -> seat index among active players (cached with the active list)."""
+        index = self._active_index
+        if index is None:
+            index = {p.player_id: i for i, p in enumerate(self.get_active_players())}
+            self._active_index = index
+        return index
+    
+    def _invalidate_active_cache(self):
+        """Drop the cached active players list and seat index."""
+        self._active_players_cache = None
+        self._active_index = None
     
     def get_online_active_players(self) -> List[Player]:
         """Get all online active players."""
@@ -159,10 +242,9 @@ class PresinaGameOnline:
     
     def can_start(self) -> bool:
         """Check if game can start."""
-        active = self.get_active_players()
         return (
             self.phase == GamePhase.WAITING
-            and len(active) >= self.MIN_PLAYERS
+            and self.active_count() >= self.MIN_PLAYERS
         )
     
     def start_game(self) -> bool:
@@ -211,35 +293,37 @@ class PresinaGameOnline:
             if player.join_next_turn:
                 player.join_next_turn = False
                 player.is_spectator = False
+                self._invalidate_active_cache()
                 # Set lives to minimum of active players
                 active_lives = [p.lives for p in self.get_active_players() if p != player]
                 if active_lives:
                     player.lives = min(active_lives)
+                    self._invalidate_active_cache()
         
         # Deal cards
         self.deck.reset()
-        cards_this_turn = self.CARDS_PER_TURN[self.current_turn]
+        cards_this_turn = self._cards_this_turn
         
-        for pid in self.player_order:
-            player = self.players[pid]
-            if not player.is_spectator and not player.is_eliminated:
-                cards = self.deck.draw(cards_this_turn)
-                player.receive_cards(cards)
+        active = self.get_active_players()
+        for player, cards in zip(active, self.deck.deal(len(active), cards_this_turn)):
+            player.receive_cards(cards)
         
         # Reset turn state
         self.current_trick = 0
-        self.bets_made = []
-        self.cards_on_table = []
+        self.bets_made = {}
+        self._bets_total = 0
+        self._clear_table()
         self.turn_results = []
         
         # Rotate first better
-        active_ids = [p.player_id for p in self.get_active_players()]
-        if active_ids:
-            self.first_better_index = self.current_turn % len(active_ids)
+        n_active = self.active_count()
+        if n_active:
+            self.first_better_index = self.current_turn % n_active
             self.current_player_index = self.first_better_index
             self.trick_starter_index = self.first_better_index
         
         self.phase = GamePhase.BETTING
+        self.session_seq += 1
         self._add_message('system', f"Turno {self.current_turn + 1}: {cards_this_turn} carte")
         self._sync_turn_timer()
 
@@ -247,8 +331,20 @@ class PresinaGameOnline:
         """Auto-play disabled - game waits for players indefinitely."""
         pass
 
+    def _cancel_timer_handle(self):
+        if self._timer_handle is not None:
+            self._timer_handle.cancel()
+            self._timer_handle = None
+
+    def _cancel_trick_handle(self):
+        if self._trick_handle is not None:
+            self._trick_handle.cancel()
+            self._trick_handle = None
+
     def _clear_turn_timer(self):
+        self._cancel_timer_handle()
         self.turn_timer_deadline = None
+        self._turn_timer_wall_deadline = None
         self.turn_timer_player_id = None
         self.turn_timer_type = None
 
@@ -258,7 +354,11 @@ class PresinaGameOnline:
             return
         self.turn_timer_player_id = player_id
         self.turn_timer_type = timer_type
-        self.turn_timer_deadline = time.time() + self.TURN_TIMEOUT_SECONDS
+        self.turn_timer_deadline = time.monotonic() + self.TURN_TIMEOUT_SECONDS
+        self._turn_timer_wall_deadline = time.time() + self.TURN_TIMEOUT_SECONDS
+        self._cancel_timer_handle()
+        if self.scheduler is not None:
+            self._timer_handle = self.scheduler(self.TURN_TIMEOUT_SECONDS, self._on_timer_expire)
 
     def _sync_turn_timer(self):
         """Ensure timer is aligned with current game state without resetting unnecessarily."""
@@ -285,7 +385,10 @@ class PresinaGameOnline:
             self._set_turn_timer(current_id, timer_type)
 
     def check_and_handle_turn_timeout(self) -> bool:
-        """Auto-advance a turn if the active player exceeds the time limit."""
+        """
+        Auto-advance a turn if the active player exceeds the time limit.
+        Polling fallback used by tick() when no scheduler is set.
+        """
         if self.phase not in (GamePhase.BETTING, GamePhase.PLAYING, GamePhase.WAITING_JOLLY):
             self._clear_turn_timer()
             return False
@@ -294,7 +397,20 @@ class PresinaGameOnline:
             self._sync_turn_timer()
             return False
 
-        if time.time() < self.turn_timer_deadline:
+        if time.monotonic() < self.turn_timer_deadline:
+            return False
+
+        return self._on_timer_expire()
+
+    def _on_timer_expire(self) -> bool:
+        """
+        Turn timer expired: auto-act for the timed player if they are still on turn.
+        Called by the scheduler (with the room lock held) or by check_and_handle_turn_timeout.
+        Returns True if the game state changed.
+        """
+        self._timer_handle = None
+        if self.phase not in (GamePhase.BETTING, GamePhase.PLAYING, GamePhase.WAITING_JOLLY):
+            self._clear_turn_timer()
             return False
 
         # Timer expired: verify still same active player
@@ -319,33 +435,27 @@ class PresinaGameOnline:
         self._sync_turn_timer()
         return True
     
-    def check_and_handle_offline_player(self, force_check: bool = False):
+    def check_and_handle_offline_player(self):
         """
         Check if the current player is offline and handle it.
         If player is offline for too long during their turn, auto-skip or auto-play.
         
+        Called on connection-state changes (disconnect/reconnect); while a player
+        simply stays offline the turn timer takes care of them.
+        
         Note: Players who are just 'away' (tab switched/minimized) are NOT auto-skipped.
         Only truly disconnected players (socket closed) are auto-skipped.
-        
-        Args:
-            force_check: If True, check immediately even if we checked recently
         """
         OFFLINE_TIMEOUT_SECONDS = 60  # 1 minute timeout for turn
-        CHECK_INTERVAL = 5  # Check every 5 seconds max
         
-        now = time.time()
-        
-        # Rate limit checks unless forced
-        if not force_check and now - self._last_offline_check < CHECK_INTERVAL:
-            return
-        self._last_offline_check = now
+        now = time.monotonic()
         
         if self.phase == GamePhase.WAITING or self.phase == GamePhase.GAME_OVER:
             return
         
         if self.phase == GamePhase.BETTING:
             current = self.get_current_better()
-        elif self.phase in (GamePhase.PLAYING, GamePhase.WAITING_JOLLY):
+        elif self.phase in _PLAY_PHASES:
             current = self.get_current_player()
         else:
             return
@@ -374,7 +484,7 @@ class PresinaGameOnline:
         
         if self.phase == GamePhase.BETTING:
             # Auto-bet 0 (safest bet)
-            cards_this_turn = self.CARDS_PER_TURN[self.current_turn]
+            cards_this_turn = self._cards_this_turn
             # Check if 0 is allowed (not forbidden)
             forbidden = self.get_forbidden_bet()
             if forbidden == 0:
@@ -464,44 +574,40 @@ class PresinaGameOnline:
             self._add_message('system', f"👋 {player.name} è tornato in partita")
         return True
 
-    def _handle_bot_auto_play(self, _depth: int = 0):
-        """Immediately auto-play for any bot whose turn it is."""
-        if _depth > 20:  # Safety: max 20 chained bot actions
-            return
-        if self.phase not in (GamePhase.BETTING, GamePhase.PLAYING, GamePhase.WAITING_JOLLY):
-            return
+    def _handle_bot_auto_play(self):
+        """Immediately auto-play for any bot whose turn it is (and any bots after it)."""
+        # Each action may hand the turn to another bot, e.g. several bots betting in sequence
+        for _ in range(20):  # Safety: max 20 chained bot actions
+            phase = self.phase
+            if phase == GamePhase.BETTING:
+                current = self.get_current_better()
+            elif phase == GamePhase.WAITING_JOLLY:
+                current = self.get_player(self.pending_jolly_player) if self.pending_jolly_player else None
+            elif phase == GamePhase.PLAYING:
+                current = self.get_current_player()
+            else:
+                return
 
-        # Determine current player
-        if self.phase == GamePhase.BETTING:
-            current = self.get_current_better()
-        elif self.phase == GamePhase.WAITING_JOLLY:
-            current = self.get_player(self.pending_jolly_player) if self.pending_jolly_player else None
-        else:
-            current = self.get_current_player()
+            if not current or not current.is_bot:
+                return
 
-        if not current or not current.is_bot:
-            return
+            # Bot plays immediately (no delay)
+            self._add_message('system', f"🤖 {current.name} (Bot) gioca automaticamente")
 
-        # Bot plays immediately (no delay)
-        self._add_message('system', f"🤖 {current.name} (Bot) gioca automaticamente")
-
-        if self.phase == GamePhase.BETTING:
-            forbidden = self.get_forbidden_bet()
-            auto_bet = 1 if forbidden == 0 else 0
-            self.make_bet(current.player_id, auto_bet)
-        elif self.phase == GamePhase.PLAYING:
-            if current.hand:
+            if phase == GamePhase.BETTING:
+                forbidden = self.get_forbidden_bet()
+                auto_bet = 1 if forbidden == 0 else 0
+                self.make_bet(current.player_id, auto_bet)
+            elif phase == GamePhase.PLAYING:
+                if not current.hand:
+                    return
                 card = current.hand[0]
                 if card.is_jolly:
                     self.play_card(current.player_id, card.suit, card.value, 'prende')
                 else:
                     self.play_card(current.player_id, card.suit, card.value)
-        elif self.phase == GamePhase.WAITING_JOLLY and self.pending_jolly_player == current.player_id:
-            self.play_card(current.player_id, None, None, 'prende')
-
-        # After playing, the game may have advanced to another bot's turn
-        # Recurse to handle chains of bots (e.g. multiple bots betting in sequence)
-        self._handle_bot_auto_play(_depth + 1)
+            else:
+                self.play_card(current.player_id, None, None, 'prende')
 
     def get_real_active_players(self) -> List[Player]:
         """Get active players that are NOT bots (real humans still in the game)."""
@@ -515,15 +621,21 @@ class PresinaGameOnline:
             return None
         
         active = self.get_active_players()
-        if not active:
+        n_active = len(active)
+        if not n_active:
             return None
         
-        # The next better is at index: first_better_index + number of bets already made
-        if len(self.bets_made) >= len(active):
+        bets_made = self.bets_made
+        if len(bets_made) >= n_active:
             return None  # All players have bet
         
-        idx = (self.first_better_index + len(self.bets_made)) % len(active)
-        return active[idx]
+        # First player in betting order without a bet; normally the one at
+        # first_better_index + bets made, but a removed better shifts the order
+        for offset in range(n_active):
+            player = active[(self.first_better_index + offset) % n_active]
+            if player.player_id not in bets_made:
+                return player
+        return None
     
     def get_forbidden_bet(self) -> Optional[int]:
         """
@@ -531,28 +643,34 @@ class PresinaGameOnline:
         Returns None if not the last player.
         """
         # Special (1 card) turn: sum can equal cards
-        if self.is_special_turn():
+        if self._is_special_turn:
             return None
 
-        active = self.get_active_players()
-        if len(self.bets_made) != len(active) - 1:
+        if len(self.bets_made) != self.active_count() - 1:
             return None
         
-        cards_this_turn = self.CARDS_PER_TURN[self.current_turn]
-        total_bets = sum(self.players[pid].bet for pid in self.bets_made)
-        forbidden = cards_this_turn - total_bets
+        cards_this_turn = self._cards_this_turn
+        forbidden = cards_this_turn - self._bets_total
         
         if 0 <= forbidden <= cards_this_turn:
             return forbidden
         return None
     
-    def make_bet(self, player_id: str, bet: int) -> Tuple[bool, str]:
+    def make_bet(self, player_id: str, bet: int, client_seq: Optional[int] = None) -> Tuple[bool, str]:
         """
         Make a bet for a player.
         
+        Args:
+            player_id: ID of the player
+            bet: Number of tricks
+            client_seq: session_seq the client acted on (stale values are rejected)
+        
         Returns:
-            (success, message)
+            (success, message) - message is RESYNC if client_seq is stale
         """
+        if client_seq is not None and client_seq != self.session_seq:
+            return False, self.RESYNC
+        
         if self.phase != GamePhase.BETTING:
             return False, "Non è il momento delle puntate"
         
@@ -560,11 +678,14 @@ class PresinaGameOnline:
         if not player:
             return False, "Giocatore non trovato"
         
+        if player_id in self.bets_made:
+            return False, "Hai già puntato"
+        
         current_better = self.get_current_better()
         if not current_better or current_better.player_id != player_id:
             return False, "Non è il tuo turno di puntare"
         
-        cards_this_turn = self.CARDS_PER_TURN[self.current_turn]
+        cards_this_turn = self._cards_this_turn
         
         if bet < 0 or bet > cards_this_turn:
             return False, f"La puntata deve essere tra 0 e {cards_this_turn}"
@@ -574,33 +695,26 @@ class PresinaGameOnline:
         if forbidden is not None and bet == forbidden:
             return False, f"Non puoi puntare {forbidden} (somma uguale alle carte)"
         
+        bets_made = self.bets_made
         player.make_bet(bet, cards_this_turn)
-        self.bets_made.append(player_id)
+        bets_made[player_id] = bet
+        self._bets_total += bet
         self._add_message('bet', f"{player.name} punta {bet}")
         
         # Check if all bets are made
-        if len(self.bets_made) == len(self.get_active_players()):
+        if len(bets_made) == self.active_count():
             self._start_playing()
-        else:
-            next_better = self.get_current_better()
-            if next_better:
-                self._set_turn_timer(next_better.player_id, 'betting')
+        self._after_action()
         
         return True, "Puntata registrata"
     
     def _start_playing(self):
         """Transition from betting to playing phase."""
         self.phase = GamePhase.PLAYING
-        active = self.get_active_players()
-        if active:
+        if self.active_count():
             self.trick_starter_index = self.first_better_index
             self.current_player_index = self.trick_starter_index
         self._add_message('system', "Fase di gioco iniziata")
-        current = self.get_current_player()
-        if current:
-            self._set_turn_timer(current.player_id, 'playing')
-        else:
-            self._clear_turn_timer()
     
     # ==================== Playing Phase ====================
     
@@ -610,13 +724,15 @@ class PresinaGameOnline:
             return None
         
         active = self.get_active_players()
-        if not active:
+        n_active = len(active)
+        if not n_active:
             return None
         
-        idx = (self.trick_starter_index + len(self.cards_on_table)) % len(active)
+        idx = (self.trick_starter_index + len(self.cards_on_table)) % n_active
         return active[idx]
     
-    def play_card(self, player_id: str, suit: str, value: int, jolly_choice: str = None) -> Tuple[bool, str]:
+    def play_card(self, player_id: str, suit: str, value: int, jolly_choice: str = None,
+                  client_seq: Optional[int] = None) -> Tuple[bool, str]:
         """
         Play a card.
         
@@ -625,10 +741,14 @@ class PresinaGameOnline:
             suit: Card suit
             value: Card value
             jolly_choice: 'prende' or 'lascia' if playing the jolly
+            client_seq: session_seq the client acted on (stale values are rejected)
             
         Returns:
-            (success, message)
+            (success, message) - message is RESYNC if client_seq is stale
         """
+        if client_seq is not None and client_seq != self.session_seq:
+            return False, self.RESYNC
+        
         if self.phase == GamePhase.WAITING_JOLLY:
             return self._handle_jolly_choice(player_id, jolly_choice)
         
@@ -652,23 +772,15 @@ class PresinaGameOnline:
             if not jolly_choice:
                 self.pending_jolly_player = player_id
                 self.phase = GamePhase.WAITING_JOLLY
-                # Timer for jolly choice
-                self._set_turn_timer(player_id, 'jolly')
+                self._after_action()
                 return True, "Scegli: prende o lascia?"
             card.jolly_choice = jolly_choice
         
         player.play_card(card)
-        self.cards_on_table.append((player_id, card))
+        self._push_card_on_table(player_id, card)
         self._add_message('play', f"{player.name} gioca {card.display_name}")
-        
-        # Check if trick is complete
-        active = self.get_active_players()
-        if len(self.cards_on_table) == len(active):
-            self._resolve_trick()
-        else:
-            next_player = self.get_current_player()
-            if next_player:
-                self._set_turn_timer(next_player.player_id, 'playing')
+        self._after_card_played()
+        self._after_action()
         
         return True, "Carta giocata"
     
@@ -690,7 +802,7 @@ class PresinaGameOnline:
             if card.is_jolly:
                 card.jolly_choice = choice
                 player.play_card(card)
-                self.cards_on_table.append((player_id, card))
+                self._push_card_on_table(player_id, card)
                 self._add_message('play', f"{player.name} gioca {card.display_name} ({choice})")
                 found = True
                 break
@@ -700,28 +812,26 @@ class PresinaGameOnline:
         
         self.pending_jolly_player = None
         self.phase = GamePhase.PLAYING
-        
-        # Check if trick is complete
-        active = self.get_active_players()
-        if len(self.cards_on_table) == len(active):
-            self._resolve_trick()
-        else:
-            next_player = self.get_current_player()
-            if next_player:
-                self._set_turn_timer(next_player.player_id, 'playing')
+        self._after_card_played()
+        self._after_action()
         
         return True, f"Jolly: {choice}"
     
+    def _after_card_played(self):
+        """Resolve the trick once every active player has played."""
+        if len(self.cards_on_table) == self.active_count():
+            self._resolve_trick()
+    
     def _resolve_trick(self):
         """Resolve the current trick and determine winner."""
-        if not self.cards_on_table:
+        cards_on_table = self.cards_on_table
+        if not cards_on_table:
             return
         
-        # Find winning card
-        winner_id, winner_card = self.cards_on_table[0]
-        for pid, card in self.cards_on_table[1:]:
-            if card.get_strength() > winner_card.get_strength():
-                winner_id, winner_card = pid, card
+        # Find winning card: one get_strength() per card, the scan runs inside max()
+        strengths = [card.get_strength() for _, card in cards_on_table]
+        winner_idx = max(range(len(strengths)), key=strengths.__getitem__)
+        winner_id, winner_card = cards_on_table[winner_idx]
         
         winner = self.get_player(winner_id)
         winner.win_trick()
@@ -729,41 +839,64 @@ class PresinaGameOnline:
         
         # Save winner and check if this is the last trick
         self.trick_winner_id = winner_id
-        cards_this_turn = self.CARDS_PER_TURN[self.current_turn]
+        self.trick_winner_card = winner_card
+        cards_this_turn = self._cards_this_turn
         self.is_last_trick_of_turn = (self.current_trick + 1) >= cards_this_turn
         
-        # Enter TRICK_COMPLETE phase - cards stay visible for 3 seconds
+        # Enter TRICK_COMPLETE phase - cards stay visible for 3 seconds, then the
+        # scheduler advances (tick() polls check_and_handle_trick_complete as a fallback)
         self.phase = GamePhase.TRICK_COMPLETE
+        self.trick_complete_deadline = time.monotonic() + self.TRICK_DISPLAY_SECONDS
         self._clear_turn_timer()
+        if self.scheduler is not None:
+            self._trick_handle = self.scheduler(self.TRICK_DISPLAY_SECONDS, self._on_trick_display_end)
     
     def advance_from_trick_complete(self) -> Tuple[bool, str]:
         """Advance from TRICK_COMPLETE phase after 3 second delay."""
         if self.phase != GamePhase.TRICK_COMPLETE:
             return False, "Non è il momento"
         
+        self.trick_complete_deadline = None
+        self._cancel_trick_handle()
+        
         # Set winner as next trick starter
         if self.trick_winner_id:
-            active = self.get_active_players()
-            for i, p in enumerate(active):
-                if p.player_id == self.trick_winner_id:
-                    self.trick_starter_index = i
-                    break
+            idx = self._get_active_index().get(self.trick_winner_id)
+            if idx is not None:
+                self.trick_starter_index = idx
         
         if self.is_last_trick_of_turn:
             # Last trick of turn - go to turn results
             # Don't increment current_trick since the turn is ending
+            self._after_action()
             self._end_turn()
             return True, "Fine del turno"
         else:
             # More tricks to play - increment trick counter and continue
             self.current_trick += 1
-            self.cards_on_table = []
+            self._clear_table()
             self.phase = GamePhase.PLAYING
-            current = self.get_current_player()
-            if current:
-                self._set_turn_timer(current.player_id, 'playing')
+            self._after_action()
             return True, "Prossima mano"
     
+    def check_and_handle_trick_complete(self) -> bool:
+        """Advance from TRICK_COMPLETE once the display delay has elapsed."""
+        if self.phase != GamePhase.TRICK_COMPLETE or self.trick_complete_deadline is None:
+            return False
+        if time.monotonic() < self.trick_complete_deadline:
+            return False
+        success, _ = self.advance_from_trick_complete()
+        return success
+
+    def _on_trick_display_end(self) -> bool:
+        """
+        Trick display delay elapsed: advance to the next trick or the turn results.
+        Called by the scheduler with the room lock held. Returns True if the state changed.
+        """
+        self._trick_handle = None
+        success, _ = self.advance_from_trick_complete()
+        return success
+    
     def _end_turn(self):
         """End the current turn and calculate results."""
         self.turn_results = []
@@ -793,6 +926,9 @@ class PresinaGameOnline:
             else:
                 self._add_message('result', f"{player.name}: sbagliato, perde 1 vita")
 
+        # Lives changed: some players may now be eliminated
+        self._invalidate_active_cache()
+        
         # Track if everyone was correct this turn
         self.last_turn_all_correct = all(r.get('correct') for r in self.turn_results)
 
@@ -800,10 +936,9 @@ class PresinaGameOnline:
         self._clear_turn_timer()
 
         # Check for game over
-        active = self.get_active_players()
-        if len(active) <= 1:
+        if self.active_count() <= 1:
             self._end_game()
-        elif self.current_turn >= 4:
+        elif self.current_turn >= self.LAST_TURN_INDEX:
             # On last turn, only end if someone made a mistake
             if not self.last_turn_all_correct:
                 self._end_game()
@@ -824,16 +959,16 @@ class PresinaGameOnline:
             return False, "Solo l'admin può passare al prossimo turno"
         
         # Clear cards from table
-        self.cards_on_table = []
+        self._clear_table()
         self.last_trick_cards = []
         
         # Admin advances the turn
-        if self.current_turn >= 4 and self.last_turn_all_correct:
+        if self.current_turn >= self.LAST_TURN_INDEX and self.last_turn_all_correct:
             # Repeat the special (1 card) turn until someone makes a mistake
             self._start_turn()
         else:
             self.current_turn += 1
-            if self.current_turn < 5:
+            if self.current_turn <= self.LAST_TURN_INDEX:
                 self._start_turn()
             else:
                 self._end_game()
@@ -843,23 +978,26 @@ class PresinaGameOnline:
     def _end_game(self):
         """End the game and calculate final standings."""
         self.phase = GamePhase.GAME_OVER
+        self.session_seq += 1
         self._clear_turn_timer()
+        self._cancel_trick_handle()
         
         # Sort non-spectator players by lives (descending)
-        all_players = [
-            p for p in self.players.values()
-            if not p.is_spectator and not p.join_next_turn
-        ]
-        all_players.sort(key=lambda p: p.lives, reverse=True)
+        all_players = sorted(
+            (p for p in self.players.values() if not p.is_spectator and not p.join_next_turn),
+            key=attrgetter('lives'),
+            reverse=True
+        )
         
-        self.game_results = []
-        for i, player in enumerate(all_players):
-            self.game_results.append({
-                'position': i + 1,
+        self.game_results = [
+            {
+                'position': position,
                 'player_id': player.player_id,
                 'name': f"🤖 {player.name}" if player.is_bot else player.name,
                 'lives': player.lives
-            })
+            }
+            for position, player in enumerate(all_players, 1)
+        ]
         
         if self.game_results:
             winner = self.game_results[0]
@@ -872,29 +1010,35 @@ class PresinaGameOnline:
         
         # Reset game-level state
         self.phase = GamePhase.WAITING
+        self.session_seq += 1
         self.current_turn = 0
         self.current_trick = 0
         self.current_player_index = 0
         self.first_better_index = 0
         self.trick_starter_index = 0
-        self.bets_made = []
-        self.cards_on_table = []
+        self.bets_made = {}
+        self._bets_total = 0
+        self._clear_table()
         self.last_trick_cards = []
         self.pending_jolly_player = None
         self.trick_winner_id = None
+        self.trick_winner_card = None
         self.is_last_trick_of_turn = False
+        self.trick_complete_deadline = None
+        self._cancel_trick_handle()
         self.turn_results = []
         self.game_results = []
         self.last_turn_all_correct = False
-        self.messages = []
+        self.messages.clear()
+        self._recent_messages.clear()
         self._clear_turn_timer()
 
         # Remove bot players (they were abandoned and should not persist)
-        bot_ids = [pid for pid, p in self.players.items() if p.is_bot]
-        for pid in bot_ids:
-            del self.players[pid]
-            if pid in self.player_order:
-                self.player_order.remove(pid)
+        bot_ids = {pid for pid, p in self.players.items() if p.is_bot}
+        if bot_ids:
+            for pid in bot_ids:
+                del self.players[pid]
+            self.player_order = [pid for pid in self.player_order if pid not in bot_ids]
         
         # Reset each player that is still present
         for player in self.players.values():
@@ -910,56 +1054,131 @@ class PresinaGameOnline:
             player.join_next_turn = False
             player.ready_for_next_turn = False
             player.is_lobby_away = False
+        self._invalidate_active_cache()
         
         self._add_message('system', 'Nuova partita! In attesa di giocatori...')
         return True
     
     # ==================== Special Turn (1 card) ====================
     
+    @property
+    def current_turn(self) -> int:
+        """Current turn index (0-4)."""
+        return self._current_turn
+    
+    @current_turn.setter
+    def current_turn(self, turn: int):
+        # Per-turn constants are derived here so hot paths can read a plain attribute
+        self._current_turn = turn
+        self._cards_this_turn = (
+            self.CARDS_PER_TURN[turn] if 0 <= turn < len(self.CARDS_PER_TURN) else 0
+        )
+        self._is_special_turn = self._cards_this_turn == 1
+    
     def is_special_turn(self) -> bool:
         """Check if this is the special turn (1 card)."""
-        if self.current_turn < 0 or self.current_turn >= len(self.CARDS_PER_TURN):
-            return False
-        return self.CARDS_PER_TURN[self.current_turn] == 1
+        return self._is_special_turn
     
     # ==================== Utility Methods ====================
     
+    def _push_card_on_table(self, player_id: str, card: Card):
+        """Put a played card on the table."""
+        self.cards_on_table.append((player_id, card))
+        serialized = self._cards_on_table_serialized
+        if serialized is not None:
+            # New list: states already built (and maybe not yet emitted) keep the old one
+            self._cards_on_table_serialized = serialized + [(player_id, card.to_dict())]
+    
+    def _clear_table(self):
+        """Remove all cards from the table (in place; the list is reused every trick)."""
+        self.cards_on_table.clear()
+        self._cards_on_table_serialized = []
+    
+    def _get_cards_on_table_serialized(self) -> list:
+        """Serialized cards on table, built once and shared by all viewers."""
+        serialized = self._cards_on_table_serialized
+        if serialized is None:
+            serialized = [(pid, card.to_dict()) for pid, card in self.cards_on_table]
+            self._cards_on_table_serialized = serialized
+        return serialized
+    
+    def _after_action(self):
+        """
+        Common tail of every player action: record the state change and
+        point the turn timer at whoever has to act next.
+        Runs after _after_card_played() and only touches the turn timer, so
+        phase timers it may have started (the trick display) keep their own handle.
+        """
+        self.session_seq += 1
+        self._sync_turn_timer()
+    
     def _add_message(self, msg_type: str, content: str):
         """Add a game message."""
-        self.messages.append({
+        # seq keeps increasing across resets so clients can tell new messages apart
+        self._msg_counter += 1
+        message = {
+            'seq': self._msg_counter,
             'type': msg_type,
             'content': content,
-            'timestamp': time.time()
-        })
-        # Keep only last 100 messages
-        if len(self.messages) > 100:
-            self.messages = self.messages[-100:]
+            'timestamp': self._now or time.time()
+        }
+        self.messages.append(message)
+        self._recent_messages.append(message)
     
     def tick(self):
-        """Run periodic checks (offline players, turn timeouts, bot auto-play). Call once before broadcasting, NOT per-player."""
-        self.check_and_handle_offline_player()
-        self.check_and_handle_turn_timeout()
-        self._handle_bot_auto_play()
+        """Run periodic checks (turn timeouts, bot auto-play). Call once before broadcasting, NOT per-player."""
+        # Everything tick() triggers (e.g. a chain of bot moves) shares one message timestamp
+        self._now = time.time()
+        try:
+            if self.scheduler is None:
+                self.check_and_handle_turn_timeout()
+            self.check_and_handle_trick_complete()
+            self._handle_bot_auto_play()
+        finally:
+            self._now = None
 
     def get_state_for_player(self, player_id: str) -> dict:
         """Get the game state from a specific player's perspective."""
-        
-        player = self.get_player(player_id)
-        is_spectator = player is None or player.is_spectator if player else True
-        
-        active = self.get_active_players()
-        is_special = self.is_special_turn()
-        
-        # Build players info
-        players_info = []
-        for pid in self.player_order:
-            p = self.players[pid]
-            # Special turn: players see others' cards but not their own
-            hide_own_hand = is_special and self.phase in (GamePhase.BETTING, GamePhase.PLAYING, GamePhase.WAITING_JOLLY)
-            # Always include my own hand so the client can render hidden, clickable cards
-            include_hand = (pid == player_id)
-            others_hand_visible = (is_special and pid != player_id and self.phase in (GamePhase.BETTING, GamePhase.PLAYING))
-            players_info.append(p.to_dict(include_hand=include_hand, others_hand_visible=others_hand_visible))
+        return self._state_for_viewer(self._build_shared_state(), player_id)
+    
+    def get_states_for_players(self, player_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get the state for several players at once (e.g. a broadcast).
+        The viewer-independent part is built once and shared by all of them.
+        """
+        shared = self._build_shared_state()
+        return {pid: self._state_for_viewer(shared, pid) for pid in player_ids}
+    
+    def _state_for_viewer(self, shared: dict, player_id: str) -> dict:
+        """Shallow copy of the shared state with the viewer's own fields filled in."""
+        player = self.players.get(player_id)
+        state = dict(shared)
+        state['is_spectator'] = player is None or player.is_spectator
+        
+        if player is None:
+            return state
+        try:
+            seat = self.player_order.index(player_id)
+        except ValueError:
+            return state
+        # Always include my own hand so the client can render hidden, clickable cards.
+        # Special turn: players see others' cards but not their own
+        players_info = list(shared['players'])
+        players_info[seat] = player.to_dict(include_hand=True)
+        state['players'] = players_info
+        return state
+    
+    def _build_shared_state(self) -> dict:
+        """The part of the state that is the same for every viewer."""
+        is_special = self._is_special_turn
+        
+        # Players as seen by everyone else; _state_for_viewer swaps in the viewer's own entry
+        others_hand_visible = is_special and self.phase in _OTHERS_HAND_PHASES
+        players = self.players
+        players_info = [
+            players[pid].to_dict(include_hand=False, others_hand_visible=others_hand_visible)
+            for pid in self.player_order
+        ]
         
         # Current player info
         current_better = self.get_current_better()
@@ -970,51 +1189,67 @@ class PresinaGameOnline:
         if self.phase == GamePhase.TRICK_COMPLETE and self.trick_winner_id:
             winner = self.get_player(self.trick_winner_id)
             if winner:
-                # Find the winning card from cards_on_table
-                winning_card = None
-                for pid, card in self.cards_on_table:
-                    if pid == self.trick_winner_id:
-                        winning_card = card
-                        break
+                winning_card = self.trick_winner_card
                 trick_winner_info = {
                     'player_id': self.trick_winner_id,
                     'player_name': winner.name,
                     'card': winning_card.to_dict() if winning_card else None
                 }
         
-        now = time.time()
-        seconds_left = None
-        if self.turn_timer_deadline:
-            seconds_left = max(0, int(self.turn_timer_deadline - now))
+        now = time.monotonic()
+        
+        # Tell clients how long to keep the completed trick on screen
+        trick_complete_info = None
+        if self.phase == GamePhase.TRICK_COMPLETE and self.trick_complete_deadline is not None:
+            trick_complete_info = {
+                'resolves_in': max(0.0, self.trick_complete_deadline - now),
+                'next_phase': (GamePhase.TURN_RESULTS if self.is_last_trick_of_turn
+                               else GamePhase.PLAYING).value
+            }
 
         return {
             'room_id': self.room_id,
             'phase': self.phase.value,
+            'session_seq': self.session_seq,
             'current_turn': self.current_turn,
-            'cards_this_turn': self.CARDS_PER_TURN[self.current_turn] if self.current_turn < 5 else 0,
+            'cards_this_turn': self._cards_this_turn,
             'current_trick': self.current_trick,
             'is_special_turn': is_special,
             'players': players_info,
-            'player_order': self.player_order,
+            'player_order': list(self.player_order),  # Copy: player_order is edited in place
             'current_better_id': current_better.player_id if current_better else None,
             'current_player_id': current_player.player_id if current_player else None,
             'forbidden_bet': self.get_forbidden_bet(),
-            'cards_on_table': [(pid, card.to_dict()) for pid, card in self.cards_on_table],
+            'cards_on_table': self._get_cards_on_table_serialized(),
             'waiting_jolly': self.phase == GamePhase.WAITING_JOLLY,
             'pending_jolly_player': self.pending_jolly_player,
             'turn_results': self.turn_results,
             'game_results': self.game_results,
-            'is_spectator': is_spectator,
-            'messages': self.messages[-20:],  # Last 20 messages
+            'is_spectator': True,  # Set per viewer
+            'messages': list(self._recent_messages),  # Last STATE_MESSAGES messages
             'trick_winner': trick_winner_info,
-            'turn_timer': {
-                'active': self.turn_timer_deadline is not None and self.turn_timer_player_id is not None,
-                'player_id': self.turn_timer_player_id,
-                'type': self.turn_timer_type,
-                'deadline': self.turn_timer_deadline,
-                'seconds_left': seconds_left
-            }
+            'trick_complete': trick_complete_info,
+            'turn_timer': self._get_turn_timer_view(now)
+        }
+    
+    def _get_turn_timer_view(self, now: float) -> dict:
+        """Turn timer as sent to clients; the same dict is reused until something in it changes."""
+        seconds_left = None
+        if self.turn_timer_deadline:
+            seconds_left = max(0, int(self.turn_timer_deadline - now))
+        key = (self.turn_timer_player_id, self.turn_timer_type, self._turn_timer_wall_deadline, seconds_left)
+        cached = self._turn_timer_view
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        view = {
+            'active': self.turn_timer_deadline is not None and self.turn_timer_player_id is not None,
+            'player_id': self.turn_timer_player_id,
+            'type': self.turn_timer_type,
+            'deadline': self._turn_timer_wall_deadline,  # Clients get a wall-clock deadline
+            'seconds_left': seconds_left
         }
+        self._turn_timer_view = (key, view)
+        return view
     
     def to_dict(self) -> dict:
         """Serialize full game state."""
@@ -1023,5 +1258,5 @@ class PresinaGameOnline:
             'phase': self.phase.value,
             'current_turn': self.current_turn,
             'player_count': len(self.players),
-            'active_count': len(self.get_active_players())
+            'active_count': self.active_count()
         }
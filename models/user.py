@@ -2,24 +2,86 @@
 User model and authentication system for Presina
 """
 import hashlib
+import hmac
 import secrets
 import time
 import os
 import base64
+import binascii
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
 import psycopg2
 from psycopg2 import extras, pool as pg_pool
-UPLOADS_PATH = Path(__file__).parent.parent / "uploads" / "avatars"
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+UPLOADS_PATH = PROJECT_ROOT / "uploads" / "avatars"
 DEFAULT_AVATAR_URL = "/static/img/logo.png"
 
 # Ensure uploads directory exists
 UPLOADS_PATH.mkdir(parents=True, exist_ok=True)
+UPLOADS_DIR = os.fspath(UPLOADS_PATH)  # str form for os.path calls in update_avatar
+
+MAX_AVATAR_BYTES = 2 * 1024 * 1024
+# Leading bytes of the accepted avatar formats -> file extension
+_AVATAR_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+# Argon2id with OWASP parameters (46 MiB, 3 iterations, 1 lane)
+_password_hasher = PasswordHasher(memory_cost=47104, time_cost=3, parallelism=1)
 
 # Connection pool (lazy-initialized)
 _connection_pool = None
 
+# Short-lived cache for token lookups: sha256(token) -> (valid_until, user row).
+# Raw tokens are never kept in memory or in the database (session_token_hash);
+# entries are dropped when the user's session or profile changes.
+TOKEN_CACHE_TTL = 30  # seconds
+TOKEN_CACHE_MAX = 10000
+_token_cache = {}
+_token_cache_lock = threading.Lock()
+
+# Computed user_stats rows by user_id. Stats only change through
+# update_stats_after_game in this (single-worker) process, which drops the entry.
+_stats_cache = {}
+_stats_cache_lock = threading.RLock()
+
+STATS_COLUMNS = (
+    'user_id, games_played, games_won, games_lost, total_lives_lost, '
+    'total_lives_remaining, total_bets_correct, total_bets_wrong, total_tricks_won, '
+    'best_streak, current_streak, favorite_suit, updated_at, '
+    'win_rate, avg_lives_remaining'
+)
+
+USER_COLUMNS = 'id, username, display_name, avatar, created_at, last_login, is_active'
+
+# Hot read queries, PREPAREd once per pooled connection: name -> (arg types, SQL).
+# Needs session-level connections (direct or pgbouncer session mode).
+PREPARED_STATEMENTS = {
+    'user_by_token': ('(bytea, bigint)', f'''
+        SELECT {USER_COLUMNS}, session_expires
+        FROM users WHERE session_token_hash = $1 AND session_expires > $2
+    '''),
+    'user_by_id': ('(integer)', f'SELECT {USER_COLUMNS} FROM users WHERE id = $1'),
+    'user_stats': ('(integer)', f'SELECT {STATS_COLUMNS} FROM user_stats WHERE user_id = $1'),
+}
+
+
+class _PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which PREPARED_STATEMENTS it has prepared."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
 
 def _get_pool():
     """Get or create the connection pool."""
@@ -30,10 +92,11 @@ def _get_pool():
             raise RuntimeError("DATABASE_URL non impostata. Impostala per usare Postgres.")
         sslmode = os.environ.get("DB_SSLMODE", "require")
         _connection_pool = pg_pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
+            minconn=int(os.environ.get("DB_POOL_MIN", 1)),
+            maxconn=int(os.environ.get("DB_POOL_MAX", 10)),
             dsn=database_url,
             sslmode=sslmode,
+            connection_factory=_PreparingConnection,
         )
     return _connection_pool
 
@@ -51,11 +114,90 @@ def release_db_connection(conn):
         pass
 
 
-def init_database():
-    """Initialize the database with required tables"""
+@contextmanager
+def db_cursor():
+    """
+    Borrow a pooled connection and yield (conn, cursor) with dict rows.
+    Commits when the block exits normally, rolls back on error, and always
+    returns the connection to the pool.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-    
+    try:
+        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
+        yield conn, cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+
+def _execute_prepared(conn, cursor, name, params):
+    """Run one of PREPARED_STATEMENTS, preparing it on first use on this connection."""
+    if name not in conn.prepared:
+        arg_types, sql = PREPARED_STATEMENTS[name]
+        cursor.execute(f'PREPARE {name} {arg_types} AS {sql}')
+        conn.prepared.add(name)
+    placeholders = ', '.join(['%s'] * len(params))
+    cursor.execute(f'EXECUTE {name} ({placeholders})', params)
+
+
+def _avatar_extension(image_bytes):
+    """File extension for a supported image, or None if the bytes aren't one."""
+    for signature, extension in _AVATAR_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return extension
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _forget_cached_tokens(user_id):
+    """Drop every cached token lookup of a user."""
+    with _token_cache_lock:
+        stale = [key for key, (_, row) in _token_cache.items() if row['id'] == user_id]
+        for key in stale:
+            del _token_cache[key]
+
+
+def _stats_from_row(row):
+    """Turn a user_stats row (rates included as generated columns) into the stats dict."""
+    return dict(row) if row else {}
+
+
+# Arbitrary key for pg_advisory_xact_lock, so only one process runs the DDL
+_INIT_DB_LOCK_KEY = 7246101
+# Created last by _create_tables: if it exists, the whole schema does
+_SCHEMA_MARKER = 'public.idx_user_stats_win_rate'
+
+
+def init_database(force=False):
+    """
+    Initialize the database with required tables.
+    Cheap when the schema is already there: one lookup, no DDL.
+    """
+    with db_cursor() as (conn, cursor):
+        if not force and _schema_exists(cursor):
+            return
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (_INIT_DB_LOCK_KEY,))
+        # Another process may have finished while we waited for the lock
+        if force or not _schema_exists(cursor):
+            _create_tables(cursor)
+    print("Database initialized successfully")
+
+
+def _schema_exists(cursor):
+    cursor.execute('SELECT to_regclass(%s) AS marker', (_SCHEMA_MARKER,))
+    return cursor.fetchone()['marker'] is not None
+
+
+def _create_tables(cursor):
+    """Create the tables if they do not exist yet."""
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -69,6 +211,7 @@ def init_database():
             last_login TIMESTAMP,
             is_active BOOLEAN DEFAULT TRUE,
             session_token TEXT,
+            session_token_hash BYTEA,
             session_expires BIGINT
         )
     ''')
@@ -126,12 +269,57 @@ def init_database():
         )
     ''')
     
-    conn.commit()
-    release_db_connection(conn)
-    print("Database initialized successfully")
+    # Sessions are stored as sha256(token); move any plaintext tokens over
+    cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS session_token_hash BYTEA')
+    cursor.execute('''
+        UPDATE users
+        SET session_token_hash = sha256(convert_to(session_token, 'UTF8')), session_token = NULL
+        WHERE session_token IS NOT NULL
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_users_session_token')
+    
+    # Indexes for the hot lookups (recent games, achievements, token auth)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_game_history_user_played
+        ON game_history (user_id, played_at DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_achievements_user_unlocked
+        ON achievements (user_id, unlocked_at DESC)
+    ''')
+    # Most users have no session, so the partial index stays small
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_session_token_hash
+        ON users (session_token_hash) WHERE session_token_hash IS NOT NULL
+    ''')
+    
+    # Derived stats kept by Postgres itself (12+), so reads need no arithmetic
+    cursor.execute('''
+        ALTER TABLE user_stats
+        ADD COLUMN IF NOT EXISTS win_rate REAL GENERATED ALWAYS AS (
+            CASE WHEN games_played > 0
+                 THEN ROUND(games_won * 100.0 / games_played, 1)::real
+                 ELSE 0 END
+        ) STORED,
+        ADD COLUMN IF NOT EXISTS avg_lives_remaining REAL GENERATED ALWAYS AS (
+            CASE WHEN games_played > 0
+                 THEN ROUND(total_lives_remaining::numeric / games_played, 1)::real
+                 ELSE 0 END
+        ) STORED
+    ''')
+    # Created last: it is the _SCHEMA_MARKER
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_stats_win_rate
+        ON user_stats (win_rate DESC, games_played DESC)
+    ''')
 
 
 class User:
+    __slots__ = (
+        'id', 'username', 'display_name', 'avatar', 'created_at', 'last_login',
+        'is_active', 'stats',
+    )
+    
     def __init__(self, user_id=None, username=None, display_name=None, 
                  avatar=None, created_at=None, last_login=None, is_active=True):
         self.id = user_id
@@ -145,21 +333,33 @@ class User:
     
     @staticmethod
     def hash_password(password):
-        """Hash a password with salt"""
-        salt = secrets.token_hex(16)
-        pwd_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-        return f"{salt}${pwd_hash}"
+        """Hash a password with Argon2id"""
+        return _password_hasher.hash(password)
+    
+    @staticmethod
+    def _is_legacy_hash(hashed):
+        """Old accounts store 'salt$sha256(password + salt)'."""
+        return not hashed.startswith('$argon2') and hashed.count('$') == 1
     
     @staticmethod
     def verify_password(password, hashed):
-        """Verify a password against its hash"""
-        try:
+        """Verify a password against its hash (Argon2id or legacy salted SHA-256)"""
+        if not hashed:
+            return False
+        if User._is_legacy_hash(hashed):
             salt, stored_hash = hashed.split('$')
             pwd_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-            return pwd_hash == stored_hash
-        except:
+            return hmac.compare_digest(pwd_hash, stored_hash)
+        try:
+            return _password_hasher.verify(hashed, password)
+        except (VerificationError, InvalidHashError):
             return False
     
+    @staticmethod
+    def needs_rehash(hashed):
+        """Check whether a stored hash should be upgraded to the current parameters"""
+        return User._is_legacy_hash(hashed) or _password_hasher.check_needs_rehash(hashed)
+    
     @staticmethod
     def generate_session_token():
         """Generate a secure session token"""
@@ -167,48 +367,44 @@ class User:
     
     @classmethod
     def register(cls, username, password, email=None, display_name=None):
-        """Register a new user"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
+        """Register a new user (user row, stats row and result in one statement)"""
+        login_name = username.lower()
         try:
-            # Check if username exists
-            cursor.execute('SELECT id FROM users WHERE username = %s', (username.lower(),))
-            if cursor.fetchone():
+            # Cheap check first, so taken names don't cost an Argon2 hash
+            with db_cursor() as (conn, cursor):
+                cursor.execute('SELECT 1 FROM users WHERE username = %s', (login_name,))
+                taken = cursor.fetchone() is not None
+            if taken:
                 return None, "Username già in uso"
             
-            # Create user
             password_hash = cls.hash_password(password)
-            cursor.execute('''
-                INSERT INTO users (username, password_hash, email, display_name)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            ''', (username.lower(), password_hash, email, display_name or username))
-            
-            user_id = cursor.fetchone()['id']
-            
-            # Initialize stats
-            cursor.execute('''
-                INSERT INTO user_stats (user_id) VALUES (%s)
-            ''', (user_id,))
-            
-            conn.commit()
-            
-            return cls.get_by_id(user_id), None
-            
+            # ON CONFLICT still covers a concurrent registration of the same name
+            with db_cursor() as (conn, cursor):
+                cursor.execute(f'''
+                    WITH new_user AS (
+                        INSERT INTO users (username, password_hash, email, display_name)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (username) DO NOTHING
+                        RETURNING {USER_COLUMNS}
+                    ), new_stats AS (
+                        INSERT INTO user_stats (user_id) SELECT id FROM new_user
+                    )
+                    SELECT * FROM new_user
+                ''', (login_name, password_hash, email, display_name or username))
+                
+                row = cursor.fetchone()
         except Exception as e:
-            conn.rollback()
             return None, str(e)
-        finally:
-            release_db_connection(conn)
+        
+        if not row:
+            return None, "Username già in uso"
+        
+        return cls._from_row(row), None
     
     @classmethod
     def login(cls, username, password):
         """Login a user"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
+        with db_cursor() as (conn, cursor):
             cursor.execute('''
                 SELECT id, username, password_hash, display_name, avatar, 
                        created_at, last_login, is_active
@@ -216,8 +412,6 @@ class User:
             ''', (username.lower(),))
             
             row = cursor.fetchone()
-        finally:
-            release_db_connection(conn)
         
         if not row:
             return None, "Username o password non validi"
@@ -225,16 +419,16 @@ class User:
         if not cls.verify_password(password, row['password_hash']):
             return None, "Username o password non validi"
         
+        # Transparently upgrade legacy or outdated hashes now that we know the password
+        if cls.needs_rehash(row['password_hash']):
+            with db_cursor() as (conn, cursor):
+                cursor.execute(
+                    'UPDATE users SET password_hash = %s WHERE id = %s',
+                    (cls.hash_password(password), row['id'])
+                )
+        
         # Create session
-        user = cls(
-            user_id=row['id'],
-            username=row['username'],
-            display_name=row['display_name'],
-            avatar=row['avatar'],
-            created_at=row['created_at'],
-            last_login=row['last_login'],
-            is_active=row['is_active']
-        )
+        user = cls._from_row(row)
         
         # Update last login and create session
         session_token = user.create_session()
@@ -244,52 +438,43 @@ class User:
     @classmethod
     def get_by_id(cls, user_id):
         """Get user by ID"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
-            cursor.execute('''
-                SELECT id, username, display_name, avatar, created_at, last_login, is_active
-                FROM users WHERE id = %s
-            ''', (user_id,))
-            
+        with db_cursor() as (conn, cursor):
+            _execute_prepared(conn, cursor, 'user_by_id', (user_id,))
             row = cursor.fetchone()
-        finally:
-            release_db_connection(conn)
         
         if not row:
             return None
         
-        return cls(
-            user_id=row['id'],
-            username=row['username'],
-            display_name=row['display_name'],
-            avatar=row['avatar'],
-            created_at=row['created_at'],
-            last_login=row['last_login'],
-            is_active=row['is_active']
-        )
+        return cls._from_row(row)
     
     @classmethod
     def get_by_token(cls, token):
-        """Get user by session token"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
+        """Get user by session token (cached for up to TOKEN_CACHE_TTL seconds)"""
+        key = _token_key(token)
+        now = time.time()
+        with _token_cache_lock:
+            cached = _token_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cls._from_row(cached[1])
         
-        try:
-            cursor.execute('''
-                SELECT id, username, display_name, avatar, created_at, last_login, is_active
-                FROM users 
-                WHERE session_token = %s AND session_expires > %s
-            ''', (token, int(time.time())))
-            
+        with db_cursor() as (conn, cursor):
+            _execute_prepared(conn, cursor, 'user_by_token', (key, int(now)))
             row = cursor.fetchone()
-        finally:
-            release_db_connection(conn)
         
         if not row:
             return None
         
+        with _token_cache_lock:
+            if len(_token_cache) >= TOKEN_CACHE_MAX:
+                # Evict the oldest entry (dicts keep insertion order)
+                _token_cache.pop(next(iter(_token_cache)))
+            _token_cache[key] = (min(now + TOKEN_CACHE_TTL, row['session_expires']), row)
+        
+        return cls._from_row(row)
+    
+    @classmethod
+    def _from_row(cls, row):
+        """Build a User from a users table row."""
         return cls(
             user_id=row['id'],
             username=row['username'],
@@ -300,161 +485,149 @@ class User:
             is_active=row['is_active']
         )
     
+    @classmethod
+    def load_profile(cls, user_id, limit=10):
+        """
+        Load a user with their stats and recent games on one connection.
+        Stats and games are built like get_stats / get_recent_games.
+        
+        Returns:
+            {'user': User, 'stats': dict, 'games': list} or None if not found
+        """
+        with db_cursor() as (conn, cursor):
+            cursor.execute(f'''
+                SELECT {', '.join('u.' + c for c in USER_COLUMNS.split(', '))},
+                       {', '.join('s.' + c for c in STATS_COLUMNS.split(', '))}
+                FROM users u
+                LEFT JOIN user_stats s ON s.user_id = u.id
+                WHERE u.id = %s
+            ''', (user_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            cursor.execute('''
+                SELECT * FROM game_history 
+                WHERE user_id = %s
+                ORDER BY played_at DESC
+                LIMIT %s
+            ''', (user_id, limit))
+            games = [dict(game) for game in cursor.fetchall()]
+        
+        user = cls._from_row(row)
+        stats = {}
+        if row['user_id'] is not None:
+            stats = _stats_from_row({c: row[c] for c in STATS_COLUMNS.split(', ')})
+            with _stats_cache_lock:
+                _stats_cache[user.id] = stats
+        # Copy so callers can't alter the shared entry
+        user.stats = dict(stats)
+        return {'user': user, 'stats': user.stats, 'games': games}
+    
     def create_session(self, duration_days=7):
-        """Create a session token"""
+        """Create a session token (only its sha256 is stored)"""
+        _forget_cached_tokens(self.id)
         token = self.generate_session_token()
         expires = int(time.time()) + (duration_days * 24 * 60 * 60)
         
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
+        with db_cursor() as (conn, cursor):
             cursor.execute('''
                 UPDATE users 
-                SET session_token = %s, session_expires = %s, last_login = CURRENT_TIMESTAMP
+                SET session_token_hash = %s, session_expires = %s, last_login = CURRENT_TIMESTAMP
                 WHERE id = %s
-            ''', (token, expires, self.id))
-            
-            conn.commit()
-        finally:
-            release_db_connection(conn)
+            ''', (_token_key(token), expires, self.id))
         
         return token
     
     def logout(self):
         """Clear session"""
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-            
+        with db_cursor() as (conn, cursor):
             cursor.execute('''
-                UPDATE users SET session_token = NULL, session_expires = NULL
+                UPDATE users SET session_token_hash = NULL, session_expires = NULL
                 WHERE id = %s
             ''', (self.id,))
-            
-            conn.commit()
-        finally:
-            release_db_connection(conn)
+        _forget_cached_tokens(self.id)
     
     def get_stats(self):
         """Get user statistics"""
         if self.stats:
             return self.stats
         
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-            
-            cursor.execute('''
-                SELECT * FROM user_stats WHERE user_id = %s
-            ''', (self.id,))
-            
-            row = cursor.fetchone()
-        finally:
-            release_db_connection(conn)
-        
-        if row:
-            self.stats = dict(row)
-            # Calculate win rate
-            if self.stats['games_played'] > 0:
-                self.stats['win_rate'] = round(
-                    (self.stats['games_won'] / self.stats['games_played']) * 100, 1
-                )
-            else:
-                self.stats['win_rate'] = 0
-            
-            # Calculate average lives
-            if self.stats['games_played'] > 0:
-                self.stats['avg_lives_remaining'] = round(
-                    self.stats['total_lives_remaining'] / self.stats['games_played'], 1
-                )
-            else:
-                self.stats['avg_lives_remaining'] = 0
-        else:
-            self.stats = {}
+        with _stats_cache_lock:
+            cached = _stats_cache.get(self.id)
+        if cached is None:
+            with db_cursor() as (conn, cursor):
+                _execute_prepared(conn, cursor, 'user_stats', (self.id,))
+                row = cursor.fetchone()
+            cached = _stats_from_row(row)
+            if row:
+                with _stats_cache_lock:
+                    _stats_cache[self.id] = cached
         
+        # Copy so callers can't alter the shared entry
+        self.stats = dict(cached)
         return self.stats
     
     def update_stats_after_game(self, game_result):
-        """Update stats after a game"""
-        if self.stats is None:
-            self.get_stats()
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
-            # Update game history
-            cursor.execute('''
-                INSERT INTO game_history 
-                (user_id, room_name, players_count, final_position, final_lives,
-                 lives_lost, bets_correct, bets_wrong, tricks_won, won)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                self.id,
-                game_result.get('room_name', 'Unknown'),
-                game_result.get('players_count', 0),
-                game_result.get('final_position', 0),
-                game_result.get('final_lives', 0),
-                game_result.get('lives_lost', 0),
-                game_result.get('bets_correct', 0),
-                game_result.get('bets_wrong', 0),
-                game_result.get('tricks_won', 0),
-                game_result.get('won', False)
-            ))
-            
-            # Update aggregated stats
-            won = game_result.get('won', False)
-            if won:
-                new_streak = self.stats.get('current_streak', 0) + 1
-            else:
-                new_streak = 0
-            best_streak = max(self.stats.get('best_streak', 0), new_streak)
-            
-            cursor.execute('''
+        """
+        Record a finished game and update the aggregated stats.
+        History insert, stats update (streaks computed in SQL) and the
+        fresh stats row all come from a single statement.
+        """
+        won = bool(game_result.get('won', False))
+        with db_cursor() as (conn, cursor):
+            cursor.execute(f'''
+                WITH history AS (
+                    INSERT INTO game_history 
+                    (user_id, room_name, players_count, final_position, final_lives,
+                     lives_lost, bets_correct, bets_wrong, tricks_won, won)
+                    VALUES (%(user_id)s, %(room_name)s, %(players_count)s, %(final_position)s,
+                            %(final_lives)s, %(lives_lost)s, %(bets_correct)s, %(bets_wrong)s,
+                            %(tricks_won)s, %(won)s)
+                )
                 UPDATE user_stats SET
                     games_played = games_played + 1,
-                    games_won = games_won + %s,
-                    games_lost = games_lost + %s,
-                    total_lives_lost = total_lives_lost + %s,
-                    total_lives_remaining = total_lives_remaining + %s,
-                    total_bets_correct = total_bets_correct + %s,
-                    total_bets_wrong = total_bets_wrong + %s,
-                    total_tricks_won = total_tricks_won + %s,
-                    current_streak = %s,
-                    best_streak = %s,
+                    games_won = games_won + %(games_won)s,
+                    games_lost = games_lost + %(games_lost)s,
+                    total_lives_lost = total_lives_lost + %(lives_lost)s,
+                    total_lives_remaining = total_lives_remaining + %(final_lives)s,
+                    total_bets_correct = total_bets_correct + %(bets_correct)s,
+                    total_bets_wrong = total_bets_wrong + %(bets_wrong)s,
+                    total_tricks_won = total_tricks_won + %(tricks_won)s,
+                    current_streak = CASE WHEN %(won)s THEN current_streak + 1 ELSE 0 END,
+                    best_streak = GREATEST(best_streak,
+                                           CASE WHEN %(won)s THEN current_streak + 1 ELSE 0 END),
                     updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = %s
-            ''', (
-                1 if won else 0,
-                0 if won else 1,
-                game_result.get('lives_lost', 0),
-                game_result.get('final_lives', 0),
-                game_result.get('bets_correct', 0),
-                game_result.get('bets_wrong', 0),
-                game_result.get('tricks_won', 0),
-                new_streak,
-                best_streak,
-                self.id
-            ))
-            
-            conn.commit()
-            
-            # Reload stats
-            self.stats = None
-            self.get_stats()
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            release_db_connection(conn)
+                WHERE user_id = %(user_id)s
+                RETURNING {STATS_COLUMNS}
+            ''', {
+                'user_id': self.id,
+                'room_name': game_result.get('room_name', 'Unknown'),
+                'players_count': game_result.get('players_count', 0),
+                'final_position': game_result.get('final_position', 0),
+                'final_lives': game_result.get('final_lives', 0),
+                'lives_lost': game_result.get('lives_lost', 0),
+                'bets_correct': game_result.get('bets_correct', 0),
+                'bets_wrong': game_result.get('bets_wrong', 0),
+                'tricks_won': game_result.get('tricks_won', 0),
+                'won': won,
+                'games_won': 1 if won else 0,
+                'games_lost': 0 if won else 1
+            })
+            row = cursor.fetchone()
+        
+        # Refill the cache with the row we just got back
+        stats = _stats_from_row(row)
+        with _stats_cache_lock:
+            if row:
+                _stats_cache[self.id] = stats
+            else:
+                _stats_cache.pop(self.id, None)
+        self.stats = dict(stats)
     
     def get_recent_games(self, limit=10):
         """Get recent game history"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
+        with db_cursor() as (conn, cursor):
             cursor.execute('''
                 SELECT * FROM game_history 
                 WHERE user_id = %s
@@ -463,17 +636,12 @@ class User:
             ''', (self.id, limit))
             
             games = [dict(row) for row in cursor.fetchall()]
-        finally:
-            release_db_connection(conn)
         
         return games
     
     def get_achievements(self):
         """Get user achievements"""
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
-        
-        try:
+        with db_cursor() as (conn, cursor):
             cursor.execute('''
                 SELECT * FROM achievements 
                 WHERE user_id = %s
@@ -481,8 +649,6 @@ class User:
             ''', (self.id,))
             
             achievements = [dict(row) for row in cursor.fetchall()]
-        finally:
-            release_db_connection(conn)
         
         return achievements
     
@@ -496,44 +662,58 @@ class User:
             if ',' in image_data:
                 image_data = image_data.split(',')[1]
             
+            # Validate size (max 2MB) before decoding: 4 base64 chars -> 3 bytes
+            if len(image_data) * 3 // 4 > MAX_AVATAR_BYTES + 2:
+                return False, "Immagine troppo grande (max 2MB)"
+            
             # Decode base64
-            image_bytes = base64.b64decode(image_data)
+            try:
+                image_bytes = base64.b64decode(image_data, validate=True)
+            except binascii.Error:
+                return False, "Immagine non valida"
             
-            # Validate size (max 2MB)
-            if len(image_bytes) > 2 * 1024 * 1024:
+            if len(image_bytes) > MAX_AVATAR_BYTES:
                 return False, "Immagine troppo grande (max 2MB)"
             
-            # Generate filename
-            filename = f"user_{self.id}_{int(time.time())}.png"
-            filepath = UPLOADS_PATH / filename
+            extension = _avatar_extension(image_bytes)
+            if extension is None:
+                return False, "Formato immagine non supportato"
+            
+            # Content-addressed filename: re-uploading the same image reuses the file,
+            # and a URL never changes content, so it can be cached forever
+            digest = hashlib.sha256(image_bytes).hexdigest()[:32]
+            filename = f"user_{self.id}_{digest}.{extension}"
+            filepath = os.path.join(UPLOADS_DIR, filename)
+            avatar_url = f"/uploads/avatars/{filename}"
             
-            # Save file
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
+            # Save file (O_EXCL: never overwrite an existing file)
+            try:
+                fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                pass  # Same image already stored
+            else:
+                try:
+                    os.write(fd, image_bytes)
+                finally:
+                    os.close(fd)
             
             # Remove old avatar if exists
-            if self.avatar:
+            if self.avatar and self.avatar != avatar_url:
                 if self.avatar.startswith('/uploads/avatars/'):
-                    old_path = Path(__file__).parent.parent / self.avatar.lstrip('/')
-                    if old_path.exists():
-                        try:
-                            old_path.unlink()
-                        except:
-                            pass
+                    old_path = os.path.join(UPLOADS_DIR, os.path.basename(self.avatar))
+                    try:
+                        os.unlink(old_path)
+                    except OSError:
+                        pass
             
             # Update database
-            avatar_url = f"/uploads/avatars/{filename}"
-            conn = get_db_connection()
-            try:
-                cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
+            with db_cursor() as (conn, cursor):
                 cursor.execute(
                     'UPDATE users SET avatar = %s WHERE id = %s',
                     (avatar_url, self.id)
                 )
-                conn.commit()
-            finally:
-                release_db_connection(conn)
             
+            _forget_cached_tokens(self.id)
             self.avatar = avatar_url
             return True, avatar_url
             
@@ -542,16 +722,12 @@ class User:
 
     def update_display_name(self, display_name):
         """Update user display name"""
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=extras.RealDictCursor)
+        with db_cursor() as (conn, cursor):
             cursor.execute(
                 'UPDATE users SET display_name = %s WHERE id = %s',
                 (display_name, self.id)
             )
-            conn.commit()
-        finally:
-            release_db_connection(conn)
+        _forget_cached_tokens(self.id)
         self.display_name = display_name
     
     def to_dict(self, include_stats=False):
@@ -571,5 +747,7 @@ class User:
         return data
 
 
-# Database initialization should be called explicitly via init_database()
-# (called from app.py at startup)
+# Database initialization should be called explicitly via init_database():
+# app.py runs it at startup, `flask init-db` or `python -m models.user` on demand.
+if __name__ == '__main__':
+    init_database(force=True)
@@ -2,8 +2,10 @@
 Room Manager for Presina game.
 Handles room creation, joining, and lobby management.
 """
-from typing import Dict, List, Optional
+from typing import Callable, Deque, Dict, List, Optional
+from collections import deque
 from dataclasses import dataclass, field
+import heapq
 import time
 import uuid
 import threading
@@ -19,33 +21,45 @@ class Room:
     name: str
     admin_id: str
     created_at: float = field(default_factory=time.time)
-    last_activity: float = field(default_factory=time.time)
+    last_activity_mono: float = field(default_factory=time.monotonic)  # elapsed-time checks only
     is_public: bool = True
     access_code: Optional[str] = None  # Code for private rooms
     game: PresinaGameOnline = None
-    chat_messages: List[dict] = field(default_factory=list)
+    # Oldest messages drop off once RoomManager.MAX_CHAT_MESSAGES is reached
+    chat_messages: Deque[dict] = field(default_factory=lambda: deque(maxlen=RoomManager.MAX_CHAT_MESSAGES))
     stats_recorded: bool = False
+    # player_id -> (sid, version, state) last broadcast to that player, for state patches
+    sent_states: Dict[str, tuple] = field(default_factory=dict)
+    name_lower: str = field(default='', init=False, repr=False)  # for lobby search
+    cleanup_due: float = field(default=0.0, init=False, repr=False)  # live expiry heap entry
     
     def __post_init__(self):
+        self.name_lower = self.name.lower()
         if self.game is None:
             self.game = PresinaGameOnline(self.room_id)
     
     def update_activity(self):
         """Update last activity timestamp."""
-        self.last_activity = time.time()
+        self.last_activity_mono = time.monotonic()
     
     def is_stale(self, max_age_hours: float = 24.0) -> bool:
         """Check if room has been inactive for too long."""
-        age = time.time() - self.last_activity
+        age = time.monotonic() - self.last_activity_mono
         return age > (max_age_hours * 3600)
     
     def is_finished_and_stale(self, max_age_minutes: float = 30.0) -> bool:
         """Check if finished game room should be cleaned up."""
         if self.game.phase != GamePhase.GAME_OVER:
             return False
-        age = time.time() - self.last_activity
+        age = time.monotonic() - self.last_activity_mono
         return age > (max_age_minutes * 60)
     
+    def cleanup_deadline(self, max_age_hours: float = 24.0, finished_max_age_minutes: float = 30.0) -> float:
+        """Monotonic time at which the room becomes stale unless there is new activity."""
+        if self.game.phase == GamePhase.GAME_OVER:
+            return self.last_activity_mono + finished_max_age_minutes * 60
+        return self.last_activity_mono + max_age_hours * 3600
+    
     @property
     def status(self) -> str:
         """Get room status."""
@@ -93,36 +107,55 @@ class RoomManager:
     def __init__(self):
         self.lock = threading.RLock()  # Protects all mutable state
         self.rooms: Dict[str, Room] = {}
+        self.public_rooms: Dict[str, Room] = {}  # subset of rooms listed in the lobby
         self.player_rooms: Dict[str, str] = {}  # player_id -> room_id
         self.sid_to_player: Dict[str, str] = {}  # socket sid -> player_id
         self.player_auth: Dict[str, dict] = {}  # player_id -> auth payload
+        # (cleanup_due, room_id) min-heap; entries whose due no longer matches the room are skipped
+        self._expiry_heap: List[tuple] = []
+        # room_id -> scheduler for the room's turn timer (set by the socket layer)
+        self.scheduler_factory: Optional[Callable[[str], Callable]] = None
     
     def cleanup_stale_rooms(self) -> int:
         """
         Remove old inactive rooms.
         Returns number of rooms deleted.
         """
-        to_delete = []
+        now = time.monotonic()  # deadlines follow last_activity_mono
+        heap = self._expiry_heap
+        deleted = 0
         
-        for room_id, room in self.rooms.items():
-            # Remove finished games after shorter timeout
-            if room.is_finished_and_stale(self.FINISHED_ROOM_MAX_AGE_MINUTES):
-                to_delete.append(room_id)
-            # Remove very old inactive rooms
-            elif room.is_stale(self.ROOM_MAX_AGE_HOURS):
-                to_delete.append(room_id)
-        
-        for room_id in to_delete:
-            self.delete_room(room_id)
+        while heap and heap[0][0] <= now:
+            due, room_id = heapq.heappop(heap)
+            room = self.rooms.get(room_id)
+            if room is None or room.cleanup_due != due:
+                continue  # room deleted or rescheduled since this entry was pushed
+            # Activity since scheduling pushes the deadline forward
+            deadline = room.cleanup_deadline(self.ROOM_MAX_AGE_HOURS, self.FINISHED_ROOM_MAX_AGE_MINUTES)
+            if deadline <= now:
+                self.delete_room(room_id)
+                deleted += 1
+            else:
+                room.cleanup_due = deadline
+                heapq.heappush(heap, (deadline, room_id))
         
-        return len(to_delete)
+        return deleted
+
+    def schedule_room_cleanup(self, room: Room):
+        """
+        (Re)schedule the stale check for a room at its current deadline.
+        Call when the deadline may have moved earlier, e.g. when the game ends.
+        """
+        deadline = room.cleanup_deadline(self.ROOM_MAX_AGE_HOURS, self.FINISHED_ROOM_MAX_AGE_MINUTES)
+        room.cleanup_due = deadline
+        heapq.heappush(self._expiry_heap, (deadline, room.room_id))
 
     def cleanup_offline_players(self) -> int:
         """
         Remove waiting rooms where all players stayed offline too long.
         Returns number of rooms deleted.
         """
-        now = time.time()
+        now = time.monotonic()  # offline_since is monotonic
         deleted = 0
 
         for room_id, room in list(self.rooms.items()):
@@ -142,7 +175,7 @@ class RoomManager:
             # All players offline - check grace
             latest_offline = now  # Default to now if unknown
             for player in players:
-                offline_since = getattr(player, 'offline_since', None)
+                offline_since = player.offline_since
                 if offline_since is not None and offline_since < latest_offline:
                     latest_offline = offline_since
                 # If offline_since is None, player just went offline - use current time
@@ -173,12 +206,17 @@ class RoomManager:
             room_id = str(uuid.uuid4())[:8]
         room = Room(room_id=room_id, name=name, admin_id=admin_player.player_id, 
                     is_public=is_public, access_code=access_code)
+        if self.scheduler_factory is not None:
+            room.game.scheduler = self.scheduler_factory(room_id)
         
         # Add admin to the room
         room.game.add_player(admin_player)
         
         self.rooms[room_id] = room
+        if room.is_public:
+            self.public_rooms[room_id] = room
         self.player_rooms[admin_player.player_id] = room_id
+        self.schedule_room_cleanup(room)
         
         return room
     
@@ -188,18 +226,18 @@ class RoomManager:
     
     def delete_room(self, room_id: str):
         """Delete a room."""
-        if room_id in self.rooms:
-            room = self.rooms[room_id]
-            # Remove all players from player_rooms mapping
-            for pid in list(room.game.players.keys()):
-                if pid in self.player_rooms:
-                    del self.player_rooms[pid]
-                self.player_auth.pop(pid, None)
-            del self.rooms[room_id]
+        room = self.rooms.pop(room_id, None)
+        if room is None:
+            return
+        self.public_rooms.pop(room_id, None)
+        # Remove all players from player_rooms mapping
+        for pid in room.game.players:
+            self.player_rooms.pop(pid, None)
+            self.player_auth.pop(pid, None)
     
     def get_public_rooms(self) -> List[Room]:
         """Get all public rooms for the lobby."""
-        return [r for r in self.rooms.values() if r.is_public]
+        return list(self.public_rooms.values())
 
     # ==================== Auth Mapping ====================
 
@@ -217,7 +255,7 @@ class RoomManager:
     def search_rooms(self, query: str) -> List[Room]:
         """Search rooms by name."""
         query = query.lower()
-        return [r for r in self.get_public_rooms() if query in r.name.lower()]
+        return [r for r in self.public_rooms.values() if query in r.name_lower]
     
     # ==================== Player Management ====================
     
@@ -252,16 +290,14 @@ class RoomManager:
             return False, "Partita finita"
         
         # Check if player is already in another room
-        if player.player_id in self.player_rooms:
-            old_room_id = self.player_rooms[player.player_id]
-            if old_room_id != room_id:
-                return False, "Sei già in un'altra stanza. Abbandonala prima di entrare in una nuova."
+        old_room_id = self.player_rooms.get(player.player_id)
+        if old_room_id is not None and old_room_id != room_id:
+            return False, "Sei già in un'altra stanza. Abbandonala prima di entrare in una nuova."
         
         # Check if game is in progress
         if room.game.phase != GamePhase.WAITING:
             # If we're already in the last turn, no next turn to join
-            last_turn_index = len(PresinaGameOnline.CARDS_PER_TURN) - 1
-            if room.game.current_turn >= last_turn_index:
+            if room.game.current_turn >= PresinaGameOnline.LAST_TURN_INDEX:
                 return False, "Non puoi entrare nell'ultimo turno"
             # Join as spectator or for next turn
             if room.player_count >= PresinaGameOnline.MAX_PLAYERS:
@@ -294,28 +330,24 @@ class RoomManager:
         Returns:
             (success, message)
         """
-        if player_id not in self.player_rooms:
+        room_id = self.player_rooms.get(player_id)
+        if room_id is None:
             return False, "Non sei in nessuna stanza"
         
-        room_id = self.player_rooms[player_id]
         room = self.get_room(room_id)
-        
-        if room:
-            room.update_activity()
-        
         if not room:
             del self.player_rooms[player_id]
             return True, "Uscito dalla stanza"
+        
+        room.update_activity()
 
         # If game is over, allow a full leave and cleanup
         if room.game.phase == GamePhase.GAME_OVER:
             if player_id in room.game.players:
-                del room.game.players[player_id]
-                if player_id in room.game.player_order:
-                    room.game.player_order.remove(player_id)
+                room.game.force_remove_player(player_id)
 
-            if player_id in self.player_rooms:
-                del self.player_rooms[player_id]
+            self.player_rooms.pop(player_id, None)
+            room.sent_states.pop(player_id, None)
 
             # Handle admin reassignment or room deletion
             if len(room.game.players) == 0:
@@ -330,7 +362,7 @@ class RoomManager:
             player = room.game.get_player(player_id)
             if player:
                 player.is_online = False
-                player.offline_since = time.time()
+                player.offline_since = time.monotonic()
                 player.sid = None
             # Don't remove from player_rooms so they can rejoin
             return True, "Disconnesso dalla partita"
@@ -338,6 +370,7 @@ class RoomManager:
         # Remove from game
         room.game.remove_player(player_id)
         del self.player_rooms[player_id]
+        room.sent_states.pop(player_id, None)
         
         # Handle admin reassignment or room deletion
         if len(room.game.players) == 0:
@@ -356,10 +389,10 @@ class RoomManager:
         Returns:
             (success, message, room)
         """
-        if player_id not in self.player_rooms:
+        room_id = self.player_rooms.get(player_id)
+        if room_id is None:
             return False, "Non sei in nessuna stanza", None
 
-        room_id = self.player_rooms[player_id]
         room = self.get_room(room_id)
 
         if not room:
@@ -376,8 +409,7 @@ class RoomManager:
         # Game in progress: mark player as bot so it finishes the current turn
         room.game.mark_as_bot(player_id)
 
-        if player_id in self.player_rooms:
-            del self.player_rooms[player_id]
+        self.player_rooms.pop(player_id, None)
 
         # Remove socket mapping for this player
         sids_to_remove = [sid for sid, pid in self.sid_to_player.items() if pid == player_id]
@@ -404,10 +436,10 @@ class RoomManager:
         Returns:
             (success, message)
         """
-        if admin_id not in self.player_rooms:
+        room_id = self.player_rooms.get(admin_id)
+        if room_id is None:
             return False, "Non sei in nessuna stanza"
         
-        room_id = self.player_rooms[admin_id]
         room = self.get_room(room_id)
         
         if not room:
@@ -426,16 +458,17 @@ class RoomManager:
             return False, "Giocatore non trovato"
         
         room.game.remove_player(player_id)
-        if player_id in self.player_rooms:
-            del self.player_rooms[player_id]
+        self.player_rooms.pop(player_id, None)
+        room.sent_states.pop(player_id, None)
         
         return True, "Giocatore rimosso"
     
     def get_player_room(self, player_id: str) -> Optional[Room]:
         """Get the room a player is in."""
-        if player_id not in self.player_rooms:
+        room_id = self.player_rooms.get(player_id)
+        if room_id is None:
             return None
-        return self.get_room(self.player_rooms[player_id])
+        return self.rooms.get(room_id)
     
     # ==================== Device Takeover ====================
     
@@ -457,8 +490,8 @@ class RoomManager:
                     old_sid = player.sid
                     
                     # Remove old socket mapping (prevents old device from affecting player)
-                    if old_sid and old_sid in self.sid_to_player:
-                        del self.sid_to_player[old_sid]
+                    if old_sid:
+                        self.sid_to_player.pop(old_sid, None)
                     
                     # Update player's socket to new device
                     player.sid = new_sid
@@ -484,10 +517,10 @@ class RoomManager:
         Returns:
             (success, message, room)
         """
-        if player_id not in self.player_rooms:
+        room_id = self.player_rooms.get(player_id)
+        if room_id is None:
             return False, "Non eri in nessuna stanza", None
         
-        room_id = self.player_rooms[player_id]
         room = self.get_room(room_id)
         
         if not room:
@@ -524,10 +557,8 @@ class RoomManager:
     
     def unregister_socket(self, sid: str):
         """Unregister a socket and mark player offline."""
-        if sid in self.sid_to_player:
-            player_id = self.sid_to_player[sid]
-            del self.sid_to_player[sid]
-            
+        player_id = self.sid_to_player.pop(sid, None)
+        if player_id is not None:
             # Mark player as offline
             room = self.get_player_room(player_id)
             if room:
@@ -538,7 +569,7 @@ class RoomManager:
                     if player.sid is not None and player.sid != sid:
                         return
                     player.is_online = False
-                    player.offline_since = time.time()
+                    player.offline_since = time.monotonic()
                     player.sid = None
                     # Trigger auto-skip check for offline players
                     room.game.check_and_handle_offline_player()
@@ -554,13 +585,8 @@ class RoomManager:
                                 break
                     # During game, admin stays assigned even if offline
                 
-                # Check if all players are offline - close the room if game is in progress
-                if room.game.phase != GamePhase.WAITING and room.game.phase != GamePhase.GAME_OVER:
-                    all_offline = all(not p.is_online for p in room.game.players.values())
-                    if all_offline:
-                        # All players offline - delete the room after a short delay
-                        # (give time for reconnection)
-                        pass  # Don't delete immediately, let cleanup handle it
+                # Rooms whose players are all offline are closed by the cleanup
+                # pass after a grace period, not here, to allow reconnection.
     
     def get_player_by_sid(self, sid: str) -> Optional[str]:
         """Get player ID from socket ID."""
@@ -596,11 +622,7 @@ class RoomManager:
             'timestamp': time.time()
         }
         
-        room.chat_messages.append(msg_dict)
-        
-        # Keep only last N messages
-        if len(room.chat_messages) > self.MAX_CHAT_MESSAGES:
-            room.chat_messages = room.chat_messages[-self.MAX_CHAT_MESSAGES:]
+        room.chat_messages.append(msg_dict)  # bounded deque keeps the last N
         
         return True, msg_dict
 
@@ -27,13 +27,14 @@ def register_chat_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        room = room_manager.get_player_room(player_id)
-        if not room:
-            return
-        
-        success, msg_dict = room_manager.add_chat_message(
-            room.room_id, player_id, message
-        )
+        with room_manager.lock:
+            room = room_manager.get_player_room(player_id)
+            if not room:
+                return
+            
+            success, msg_dict = room_manager.add_chat_message(
+                room.room_id, player_id, message
+            )
         
         if success:
             # Broadcast to all players in the room (including sender)
@@ -54,8 +55,10 @@ def register_chat_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        room = room_manager.get_player_room(player_id)
-        if not room:
-            return
+        with room_manager.lock:
+            room = room_manager.get_player_room(player_id)
+            if not room:
+                return
+            messages = list(room.chat_messages)
         
-        emit('chat_history', {'messages': room.chat_messages})
+        emit('chat_history', {'messages': messages})
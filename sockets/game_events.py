@@ -3,19 +3,22 @@ Game Socket.IO events.
 """
 import time
 import logging
+import threading
 from flask import request
 from flask_socketio import emit, join_room
 
 from models.user import User
 from rooms.room_manager import room_manager
 from game.presina_game import GamePhase
-from sockets.utils import verify_player_socket
+from sockets.utils import verify_player_socket, allow_action, public_rooms_payload
 
 logger = logging.getLogger(__name__)
 
 def register_game_events(socketio):
     """Register all game-related socket events."""
     
+    room_manager.scheduler_factory = lambda room_id: _make_room_scheduler(socketio, room_id)
+    
     @socketio.on('start_game')
     def handle_start_game(data):
         """
@@ -52,9 +55,7 @@ def register_game_events(socketio):
         
         _broadcast_game_state(socketio, room)
         
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('play_again')
     def handle_play_again(data):
@@ -93,9 +94,7 @@ def register_game_events(socketio):
         # Broadcast updated state – players will see the waiting room
         _broadcast_game_state(socketio, room)
         
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('make_bet')
     def handle_make_bet(data):
@@ -113,6 +112,10 @@ def register_game_events(socketio):
         if not verify_player_socket(player_id, request.sid):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
+
+        if not allow_action(request.sid):
+            emit('error', {'message': 'Troppe azioni, rallenta'})
+            return
         
         try:
             bet_value = int(bet)
@@ -130,9 +133,12 @@ def register_game_events(socketio):
                 return
 
             room.game.tick()
-            success, message = room.game.make_bet(player_id, bet_value)
+            success, message = room.game.make_bet(player_id, bet_value, _client_seq(data))
         
         if not success:
+            if message == room.game.RESYNC:
+                _emit_resync(room, player_id)
+                return
             emit('error', {'message': message})
             return
 
@@ -156,6 +162,10 @@ def register_game_events(socketio):
         if not verify_player_socket(player_id, request.sid):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
+
+        if not allow_action(request.sid):
+            emit('error', {'message': 'Troppe azioni, rallenta'})
+            return
         
         try:
             card_value = int(value)
@@ -170,11 +180,15 @@ def register_game_events(socketio):
                 return
 
             room.game.tick()
-            success, message = room.game.play_card(player_id, suit, card_value, jolly_choice)
+            success, message = room.game.play_card(player_id, suit, card_value, jolly_choice,
+                                                   client_seq=_client_seq(data))
             waiting_jolly = (room.game.phase == GamePhase.WAITING_JOLLY
                              and room.game.pending_jolly_player == player_id)
         
         if not success:
+            if message == room.game.RESYNC:
+                _emit_resync(room, player_id)
+                return
             emit('error', {'message': message})
             return
 
@@ -201,6 +215,10 @@ def register_game_events(socketio):
         if not verify_player_socket(player_id, request.sid):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
+
+        if not allow_action(request.sid):
+            emit('error', {'message': 'Troppe azioni, rallenta'})
+            return
         
         with room_manager.lock:
             room = room_manager.get_player_room(player_id)
@@ -208,9 +226,13 @@ def register_game_events(socketio):
                 emit('error', {'message': 'Non sei in nessuna stanza'})
                 return
             
-            success, message = room.game.play_card(player_id, None, None, choice)
+            success, message = room.game.play_card(player_id, None, None, choice,
+                                                   client_seq=_client_seq(data))
         
         if not success:
+            if message == room.game.RESYNC:
+                _emit_resync(room, player_id)
+                return
             emit('error', {'message': message})
             return
 
@@ -266,18 +288,20 @@ def register_game_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        room = room_manager.get_player_room(player_id)
-        if not room:
-            emit('error', {'message': 'Non sei in nessuna stanza'})
-            return
-        
-        # Server-side admin check - ignore what client says
-        is_admin = room.admin_id == player_id
-        if not is_admin:
-            emit('error', {'message': 'Solo l\'admin può avviare il prossimo turno'})
-            return
-        
-        success, message = room.game.ready_for_next_turn(player_id, is_admin)
+        with room_manager.lock:
+            room = room_manager.get_player_room(player_id)
+            if not room:
+                emit('error', {'message': 'Non sei in nessuna stanza'})
+                return
+            
+            # Server-side admin check - ignore what client says
+            is_admin = room.admin_id == player_id
+            if not is_admin:
+                emit('error', {'message': 'Solo l\'admin può avviare il prossimo turno'})
+                return
+            
+            success, message = room.game.ready_for_next_turn(player_id, is_admin)
+            game_over = room.game.phase == GamePhase.GAME_OVER
         
         if not success:
             emit('error', {'message': message})
@@ -287,10 +311,8 @@ def register_game_events(socketio):
         _broadcast_game_state(socketio, room)
         
         # If game is over, update room list
-        if room.game.phase == GamePhase.GAME_OVER:
-            socketio.emit('rooms_list', {
-                'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-            })
+        if game_over:
+            socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('get_game_state')
     def handle_get_game_state(data):
@@ -325,8 +347,10 @@ def register_game_events(socketio):
             room.game.tick()
             state = room.game.get_state_for_player(player_id)
             state['admin_id'] = room.admin_id
+            # Also the resync point for clients that got a patch they could not apply
+            event, payload = _full_state_message(room, player_id, request.sid, state)
 
-        emit('game_state', {'game_state': state})
+        emit(event, payload)
     
     @socketio.on('ping')
     def handle_ping(data):
@@ -436,17 +460,74 @@ def register_game_events(socketio):
 
             state = room.game.get_state_for_player(player_id)
             state['admin_id'] = room.admin_id
+            _, payload = _full_state_message(room, player_id, request.sid, state)
+            payload['room'] = room.to_dict()
 
         # Send state to the returning player
-        emit('rejoin_success', {
-            'room': room.to_dict(),
-            'game_state': state
-        })
+        emit('rejoin_success', payload)
 
         # Broadcast updated state to everyone
         _broadcast_game_state(socketio, room)
 
 
+def _client_seq(data):
+    """Get the session_seq echoed by the client, or None if missing/invalid."""
+    seq = data.get('seq')
+    if seq is None:
+        return None
+    try:
+        return int(seq)
+    except (ValueError, TypeError):
+        return None
+
+
+class _TimerHandle:
+    """Cancellable room timer: stops the waiting thread and blocks a late callback."""
+    __slots__ = ('cancelled', 'timer')
+
+    def __init__(self):
+        self.cancelled = False
+        self.timer = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+def _make_room_scheduler(socketio, room_id):
+    """Build the scheduler(delay, callback) used by a room's turn timer."""
+    def schedule(delay, callback):
+        handle = _TimerHandle()
+
+        def run():
+            with room_manager.lock:
+                room = room_manager.get_room(room_id)
+                # Cancelled handles are checked under the lock, so a timer that
+                # was reset while this thread waited for the lock never fires
+                if handle.cancelled or not room:
+                    return
+                changed = callback()
+            if changed:
+                _broadcast_game_state(socketio, room)
+
+        # A cancelled threading.Timer exits right away instead of sleeping out its delay
+        handle.timer = threading.Timer(delay, run)
+        handle.timer.daemon = True
+        handle.timer.start()
+        return handle
+    return schedule
+
+
+def _emit_resync(room, player_id):
+    """Send fresh state to a client whose action was based on a stale session_seq."""
+    with room_manager.lock:
+        state = room.game.get_state_for_player(player_id)
+        state['admin_id'] = room.admin_id
+        event, payload = _full_state_message(room, player_id, request.sid, state)
+    emit(event, payload)
+
+
 def _broadcast_game_state(socketio, room, include_offline=False):
     """Broadcast game state to all players in a room.
     
@@ -459,27 +540,62 @@ def _broadcast_game_state(socketio, room, include_offline=False):
         room.game.tick()
 
         if room.game.phase == GamePhase.GAME_OVER:
+            if not room.stats_recorded:
+                # Finished rooms expire sooner; move their cleanup forward once
+                room_manager.schedule_room_cleanup(room)
             _record_game_stats(room)
 
-        # Build all states while holding lock
-        states_to_send = []
-        for pid, player in room.game.players.items():
-            if player.sid and (player.is_online or include_offline):
-                try:
-                    state = room.game.get_state_for_player(pid)
-                    state['admin_id'] = room.admin_id
-                    states_to_send.append((player.sid, state))
-                except Exception as e:
-                    logger.error(f"Error building state for {pid}: {e}")
+        # Build all states while holding lock; the shared part is built once
+        targets = {
+            pid: player.sid for pid, player in room.game.players.items()
+            if player.sid and (player.is_online or include_offline)
+        }
+        messages_to_send = []
+        try:
+            states = room.game.get_states_for_players(list(targets))
+        except Exception as e:
+            logger.error(f"Error building states for room {room.room_id}: {e}")
+            states = {}
+        for pid, state in states.items():
+            state['admin_id'] = room.admin_id
+            message = _state_message(room, pid, targets[pid], state)
+            if message:
+                messages_to_send.append((targets[pid], message))
 
     # Emit outside lock (I/O)
-    for sid, state in states_to_send:
+    for sid, (event, payload) in messages_to_send:
         try:
-            socketio.emit('game_state', {'game_state': state}, room=sid)
+            socketio.emit(event, payload, room=sid)
         except Exception as e:
             logger.error(f"Error emitting to {sid}: {e}")
 
 
+def _full_state_message(room, player_id, sid, state):
+    """Full game_state payload, recorded as the base for this player's next patch."""
+    prev = room.sent_states.get(player_id)
+    version = prev[1] + 1 if prev else 1
+    room.sent_states[player_id] = (sid, version, state)
+    return 'game_state', {'game_state': state, 'state_version': version}
+
+
+def _state_message(room, player_id, sid, state):
+    """
+    Event and payload that bring a player from the last state they were sent to `state`:
+    a game_state_patch with only the changed top-level keys, or the full state if
+    there is no base for this socket. Returns None if nothing changed.
+    Must be called with room_manager.lock held.
+    """
+    prev = room.sent_states.get(player_id)
+    if prev is None or prev[0] != sid:
+        return _full_state_message(room, player_id, sid, state)
+    _, base, old_state = prev
+    changes = {key: value for key, value in state.items() if old_state.get(key) != value}
+    if not changes:
+        return None
+    room.sent_states[player_id] = (sid, base + 1, state)
+    return 'game_state_patch', {'base': base, 'version': base + 1, 'changes': changes}
+
+
 def _broadcast_to_room(socketio, room, event, data, include_offline=False):
     """Broadcast an event to all players in a room."""
     targets = []
@@ -0,0 +1,31 @@
+"""
+JSON codec for Socket.IO packets.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Socket.IO only needs a module-like object with dumps/loads.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj, **kwargs) -> str:
+        """Encode obj to a JSON string (keyword arguments are ignored)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(s, **kwargs):
+        """Decode a JSON string or bytes."""
+        return orjson.loads(s)
+else:
+    def dumps(obj, **kwargs) -> str:
+        """Encode obj to a compact JSON string."""
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(s, **kwargs):
+        """Decode a JSON string or bytes."""
+        return json.loads(s, **kwargs)
@@ -2,6 +2,7 @@
 Lobby Socket.IO events.
 """
 import logging
+import threading
 import uuid
 from flask import request, current_app
 from flask_socketio import emit, join_room, leave_room
@@ -10,7 +11,8 @@ from auth_utils import resolve_token, build_auth_payload
 from game.player import Player
 from game.presina_game import GamePhase
 from rooms.room_manager import room_manager
-from sockets.utils import verify_player_socket, ensure_player_socket
+from sockets.game_events import _broadcast_game_state, _full_state_message
+from sockets.utils import verify_player_socket, ensure_player_socket, forget_socket, public_rooms_payload
 
 logger = logging.getLogger(__name__)
 
@@ -45,22 +47,28 @@ def _emit_room_state(socketio, room, event: str, extra: dict = None, exclude_pla
     """
     if not room:
         return
-    for pid, player in room.game.players.items():
-        if exclude_player_id and pid == exclude_player_id:
-            continue
-        # Always try to emit if player has a sid, regardless of online status
-        # This ensures reconnected players get updates
-        if player.sid:
-            try:
+    messages_to_send = []
+    with room_manager.lock:
+        for pid, player in room.game.players.items():
+            if exclude_player_id and pid == exclude_player_id:
+                continue
+            # Always try to emit if player has a sid, regardless of online status
+            # This ensures reconnected players get updates
+            if player.sid:
                 state = room.game.get_state_for_player(pid)
                 state['admin_id'] = room.admin_id
-                payload = {'game_state': state}
+                # Versioned like game_state, so it becomes the base for the next patch
+                _, payload = _full_state_message(room, pid, player.sid, state)
                 if extra:
                     payload.update(extra)
-                socketio.emit(event, payload, room=player.sid)
-            except Exception:
-                # Ignore emit errors (player may have disconnected)
-                pass
+                messages_to_send.append((player.sid, payload))
+    # Emit outside lock (I/O)
+    for sid, payload in messages_to_send:
+        try:
+            socketio.emit(event, payload, room=sid)
+        except Exception:
+            # Ignore emit errors (player may have disconnected)
+            pass
 
 def register_lobby_events(socketio):
     """Register all lobby-related socket events."""
@@ -75,35 +83,37 @@ def register_lobby_events(socketio):
         """Handle disconnection."""
         logger.info(f"Client disconnected: {request.sid}")
         
-        # Get player_id BEFORE unregistering (otherwise it's deleted)
-        player_id = room_manager.get_player_by_sid(request.sid)
-        
-        # Now unregister the socket
-        room_manager.unregister_socket(request.sid)
+        with room_manager.lock:
+            # Get player_id BEFORE unregistering (otherwise it's deleted)
+            player_id = room_manager.get_player_by_sid(request.sid)
+            
+            # Now unregister the socket
+            room_manager.unregister_socket(request.sid)
+            
+            # Notify room if player was in one
+            room = room_manager.get_player_room(player_id) if player_id else None
+        forget_socket(request.sid)
         
-        # Notify room if player was in one
-        room = room_manager.get_player_room(player_id) if player_id else None
         room_id_for_broadcast = room.room_id if room else None
         if player_id and room_id_for_broadcast:
-            import threading
             def delayed_broadcast():
-                import time
-                time.sleep(2)  # Wait 2 seconds for quick reconnect
                 with room_manager.lock:
                     # Re-fetch room - it may have been deleted in the meantime
                     still_room = room_manager.get_room(room_id_for_broadcast)
                     if not still_room:
                         return
                     player = still_room.game.get_player(player_id)
-                    if player and not player.is_online:
-                        _emit_room_state(socketio, still_room, 'game_state')
+                    if not player or player.is_online:
+                        return
+                _emit_room_state(socketio, still_room, 'game_state')
             
-            threading.Thread(target=delayed_broadcast, daemon=True).start()
+            # Wait 2 seconds for quick reconnect, on the same daemon timers as the room scheduler
+            grace_timer = threading.Timer(2, delayed_broadcast)
+            grace_timer.daemon = True
+            grace_timer.start()
         
         # Broadcast updated room list (may clean up offline ghosts)
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('register_player')
     def handle_register(data):
@@ -137,38 +147,36 @@ def register_lobby_events(socketio):
         if user_id:
             with room_manager.lock:
                 result = room_manager.takeover_player_session(user_id, request.sid)
+                if result:
+                    old_player_id, room, old_sid = result
+                    room_manager.set_player_auth(old_player_id, auth)
+                    player = room.game.get_player(old_player_id)
+                    player_name = player.name if player else name
+                    existing_room = room.to_dict()
             if result:
-                old_player_id, room, old_sid = result
-                room_manager.set_player_auth(old_player_id, auth)
-                
                 # Notify old device that session was transferred
                 if old_sid:
                     socketio.emit('session_taken_over', {
                         'message': 'La tua sessione è stata trasferita su un altro dispositivo'
                     }, to=old_sid)
                 
-                player = room.game.get_player(old_player_id)
                 emit('registered', {
                     'player_id': old_player_id,
-                    'name': player.name if player else name,
-                    'existing_room': room.to_dict()
+                    'name': player_name,
+                    'existing_room': existing_room
                 })
                 return
         
         # Normal registration – no existing session found
         with room_manager.lock:
             room_manager.register_socket(request.sid, player_id)
-        if auth:
             room_manager.set_player_auth(player_id, auth)
-        else:
-            room_manager.set_player_auth(player_id, None)
         emit('registered', {'player_id': player_id, 'name': name})
     
     @socketio.on('list_rooms')
     def handle_list_rooms():
         """Get list of public rooms."""
-        rooms = room_manager.get_public_rooms()
-        emit('rooms_list', {'rooms': [r.to_dict() for r in rooms]})
+        emit('rooms_list', public_rooms_payload())
     
     @socketio.on('search_rooms')
     def handle_search_rooms(data):
@@ -177,8 +185,9 @@ def register_lobby_events(socketio):
         Data: { query }
         """
         query = data.get('query', '')
-        rooms = room_manager.search_rooms(query)
-        emit('rooms_list', {'rooms': [r.to_dict() for r in rooms]})
+        with room_manager.lock:
+            rooms = [r.to_dict() for r in room_manager.search_rooms(query)]
+        emit('rooms_list', {'rooms': rooms})
     
     @socketio.on('create_room')
     def handle_create_room(data):
@@ -207,7 +216,8 @@ def register_lobby_events(socketio):
             user, is_guest = resolve_token(auth_token)
             if user:
                 auth = build_auth_payload(user, is_guest)
-                room_manager.set_player_auth(player_id, auth)
+                with room_manager.lock:
+                    room_manager.set_player_auth(player_id, auth)
         if auth:
             auth_name = auth.get('display_name') or auth.get('username')
             if auth_name:
@@ -221,34 +231,32 @@ def register_lobby_events(socketio):
             emit('error', {'message': str(e)})
             return
         
-        # Check if already in a room
-        existing_room = room_manager.get_player_room(player_id)
-        if existing_room:
-            emit('error', {'message': 'Sei già in una stanza. Abbandonala prima di crearne una nuova.'})
-            return
-        
         # Create player and room
         user_id = auth.get('user_id') if auth and not auth.get('is_guest') else None
         is_guest = auth.get('is_guest', False) if auth else False
         player = Player(player_id, player_name, request.sid, user_id=user_id, is_guest=is_guest)
-        room = room_manager.create_room(room_name, player, is_public=is_public, access_code=access_code)
+        
+        with room_manager.lock:
+            # Check if already in a room
+            if room_manager.get_player_room(player_id):
+                emit('error', {'message': 'Sei già in una stanza. Abbandonala prima di crearne una nuova.'})
+                return
+            
+            room = room_manager.create_room(room_name, player, is_public=is_public, access_code=access_code)
+            
+            state = room.game.get_state_for_player(player_id)
+            state['admin_id'] = room.admin_id
+            _, payload = _full_state_message(room, player_id, request.sid, state)
+            # Include access code in response for private rooms (admin needs to share it)
+            payload['room'] = room.to_dict_with_code() if not is_public else room.to_dict()
         
         # Join socket room
         join_room(room.room_id)
         
-        state = room.game.get_state_for_player(player_id)
-        state['admin_id'] = room.admin_id
-        # Include access code in response for private rooms (admin needs to share it)
-        room_dict = room.to_dict_with_code() if not is_public else room.to_dict()
-        emit('room_created', {
-            'room': room_dict,
-            'game_state': state
-        })
+        emit('room_created', payload)
         
         # Broadcast updated room list
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('join_room')
     def handle_join_room(data):
@@ -276,7 +284,8 @@ def register_lobby_events(socketio):
             user, is_guest = resolve_token(auth_token)
             if user:
                 auth = build_auth_payload(user, is_guest)
-                room_manager.set_player_auth(player_id, auth)
+                with room_manager.lock:
+                    room_manager.set_player_auth(player_id, auth)
         if auth:
             auth_name = auth.get('display_name') or auth.get('username')
             if auth_name:
@@ -294,25 +303,26 @@ def register_lobby_events(socketio):
         is_guest = auth.get('is_guest', False) if auth else False
         player = Player(player_id, player_name, request.sid, user_id=user_id, is_guest=is_guest)
         
-        success, message = room_manager.join_room(room_id, player, access_code=access_code)
-        
-        if not success:
-            emit('error', {'message': message})
-            return
-        
-        room = room_manager.get_room(room_id)
+        with room_manager.lock:
+            success, message = room_manager.join_room(room_id, player, access_code=access_code)
+            
+            if not success:
+                emit('error', {'message': message})
+                return
+            
+            room = room_manager.get_room(room_id)
+            room_manager.register_socket(request.sid, player_id)
+            
+            state = room.game.get_state_for_player(player_id)
+            state['admin_id'] = room.admin_id
+            _, payload = _full_state_message(room, player_id, request.sid, state)
+            payload['room'] = room.to_dict()
+            payload['message'] = message
         
         # Join socket room
         join_room(room_id)
-        room_manager.register_socket(request.sid, player_id)
         
-        state = room.game.get_state_for_player(player_id)
-        state['admin_id'] = room.admin_id
-        emit('room_joined', {
-            'room': room.to_dict(),
-            'game_state': state,
-            'message': message
-        })
+        emit('room_joined', payload)
         
         # Notify other players
         _emit_room_state(
@@ -324,9 +334,7 @@ def register_lobby_events(socketio):
         )
         
         # Broadcast updated room list
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('leave_room')
     def handle_leave_room(data):
@@ -344,16 +352,18 @@ def register_lobby_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        room = room_manager.get_player_room(player_id)
-        room_id = room.room_id if room else None
-        
-        success, message = room_manager.leave_room(player_id)
+        with room_manager.lock:
+            room = room_manager.get_player_room(player_id)
+            room_id = room.room_id if room else None
+            
+            success, message = room_manager.leave_room(player_id)
+            
+            room = room_manager.get_room(room_id) if room_id else None
         
         if room_id:
             leave_room(room_id)
             
             # Notify other players
-            room = room_manager.get_room(room_id)
             if room:
                 _emit_room_state(
                     socketio,
@@ -366,9 +376,7 @@ def register_lobby_events(socketio):
         emit('left_room', {'message': message})
         
         # Broadcast updated room list
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
 
     @socketio.on('abandon_room')
     def handle_abandon_room(data):
@@ -400,17 +408,14 @@ def register_lobby_events(socketio):
             leave_room(room_id)
 
         if room:
-            # Use _broadcast_game_state from game_events which calls tick()
-            # to trigger bot auto-play if it's the bot's turn
-            from sockets.game_events import _broadcast_game_state
+            # _broadcast_game_state calls tick() to trigger bot auto-play
+            # if it's the bot's turn
             _broadcast_game_state(socketio, room)
 
         emit('left_room', {'message': message})
 
         # Broadcast updated room list
-        socketio.emit('rooms_list', {
-            'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]
-        })
+        socketio.emit('rooms_list', public_rooms_payload())
     
     @socketio.on('kick_player')
     def handle_kick_player(data):
@@ -429,15 +434,16 @@ def register_lobby_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        room = room_manager.get_player_room(admin_id)
-        if not room:
-            emit('error', {'message': 'Non sei in nessuna stanza'})
-            return
-        
-        player = room.game.get_player(player_id)
-        player_sid = player.sid if player else None
-        
-        success, message = room_manager.kick_player(admin_id, player_id)
+        with room_manager.lock:
+            room = room_manager.get_player_room(admin_id)
+            if not room:
+                emit('error', {'message': 'Non sei in nessuna stanza'})
+                return
+            
+            player = room.game.get_player(player_id)
+            player_sid = player.sid if player else None
+            
+            success, message = room_manager.kick_player(admin_id, player_id)
         
         if not success:
             emit('error', {'message': message})
@@ -472,21 +478,23 @@ def register_lobby_events(socketio):
             emit('error', {'message': 'Sessione non valida, ricarica la pagina'})
             return
         
-        success, message, room = room_manager.rejoin_room(player_id, request.sid)
-        
-        if not success:
-            emit('rejoin_failed', {'message': message})
-            return
+        with room_manager.lock:
+            success, message, room = room_manager.rejoin_room(player_id, request.sid)
+            
+            if not success:
+                emit('rejoin_failed', {'message': message})
+                return
+            
+            room_manager.register_socket(request.sid, player_id)
+            
+            state = room.game.get_state_for_player(player_id)
+            state['admin_id'] = room.admin_id
+            _, payload = _full_state_message(room, player_id, request.sid, state)
+            payload['room'] = room.to_dict()
         
-        room_manager.register_socket(request.sid, player_id)
         join_room(room.room_id)
         
-        state = room.game.get_state_for_player(player_id)
-        state['admin_id'] = room.admin_id
-        emit('rejoin_success', {
-            'room': room.to_dict(),
-            'game_state': state
-        })
+        emit('rejoin_success', payload)
         
         # Notify other players
         emit('player_reconnected', {
@@ -1,8 +1,20 @@
 """
 Shared socket utilities for Presina.
 """
+import threading
+import time
+from typing import Dict, Tuple
+
 from rooms.room_manager import room_manager
 
+# Per-socket token bucket for game actions: bursts of ACTION_BURST,
+# refilled at ACTION_RATE tokens per second.
+ACTION_BURST = 5
+ACTION_RATE = 2.0
+
+_action_buckets: Dict[str, Tuple[float, float]] = {}  # sid -> (last refill, tokens)
+_action_lock = threading.Lock()
+
 
 def verify_player_socket(player_id: str, sid: str) -> bool:
     """
@@ -18,8 +30,37 @@ def ensure_player_socket(player_id: str, sid: str) -> bool:
     Ensure this socket is associated with the player_id.
     If the socket isn't registered yet, register it.
     """
-    registered_player = room_manager.get_player_by_sid(sid)
-    if registered_player is None:
-        room_manager.register_socket(sid, player_id)
-        return True
+    with room_manager.lock:
+        registered_player = room_manager.get_player_by_sid(sid)
+        if registered_player is None:
+            room_manager.register_socket(sid, player_id)
+            return True
     return registered_player == player_id
+
+
+def public_rooms_payload() -> dict:
+    """Build the rooms_list payload for the lobby under the room manager lock."""
+    with room_manager.lock:
+        return {'rooms': [r.to_dict() for r in room_manager.get_public_rooms()]}
+
+
+def allow_action(sid: str) -> bool:
+    """
+    Consume one action token for this socket.
+    Returns False when the socket is sending actions faster than allowed.
+    """
+    now = time.monotonic()
+    with _action_lock:
+        last, tokens = _action_buckets.get(sid, (now, ACTION_BURST))
+        tokens = min(ACTION_BURST, tokens + (now - last) * ACTION_RATE)
+        if tokens < 1:
+            _action_buckets[sid] = (now, tokens)
+            return False
+        _action_buckets[sid] = (now, tokens - 1)
+        return True
+
+
+def forget_socket(sid: str):
+    """Drop the rate limit state of a disconnected socket."""
+    with _action_lock:
+        _action_buckets.pop(sid, None)
@@ -346,11 +346,8 @@ const AuthUI = {
         const avatarBtn = document.querySelector('label[for="avatar-upload-input"]');
         if (avatarBtn) avatarBtn.classList.remove('hidden');
         
-        // Load fresh stats
-        await this.loadUserStats();
-        
-        // Load game history
-        await this.loadGameHistory();
+        // Load fresh stats and game history
+        await this.loadProfile();
         
         // Load leaderboard
         await this.loadLeaderboard('wins');
@@ -495,6 +492,26 @@ const AuthUI = {
         }
     },
     
+    async loadProfile() {
+        if (!this.authToken) return;
+        
+        try {
+            // Stats and game history come back together in one request
+            const response = await fetch('/api/user/profile?limit=10', {
+                headers: { 'Authorization': `Bearer ${this.authToken}` }
+            });
+            
+            const data = await response.json();
+            
+            if (data.success) {
+                this.renderUserStats(data.stats);
+            }
+            this.renderGameHistory(data.success ? data.games : []);
+        } catch (error) {
+            console.error('Load profile error:', error);
+        }
+    },
+    
     async loadUserStats() {
         if (!this.authToken) return;
         
@@ -505,27 +522,31 @@ const AuthUI = {
             
             const data = await response.json();
             
-            if (data.success && data.stats) {
-                const stats = data.stats;
-                document.getElementById('profile-stat-games').textContent = stats.games_played || 0;
-                document.getElementById('profile-stat-wins').textContent = stats.games_won || 0;
-                document.getElementById('profile-stat-losses').textContent = stats.games_lost || 0;
-                document.getElementById('profile-stat-winrate').textContent = `${stats.win_rate || 0}%`;
-                document.getElementById('profile-stat-lives').textContent = stats.total_lives_lost || 0;
-                document.getElementById('profile-stat-streak').textContent = stats.best_streak || 0;
-                
-                const homeGames = document.getElementById('home-stat-games');
-                const homeWins = document.getElementById('home-stat-wins');
-                const homeRate = document.getElementById('home-stat-winrate');
-                if (homeGames) homeGames.textContent = stats.games_played || 0;
-                if (homeWins) homeWins.textContent = stats.games_won || 0;
-                if (homeRate) homeRate.textContent = `${stats.win_rate || 0}%`;
+            if (data.success) {
+                this.renderUserStats(data.stats);
             }
         } catch (error) {
             console.error('Load stats error:', error);
         }
     },
     
+    renderUserStats(stats) {
+        if (!stats) return;
+        document.getElementById('profile-stat-games').textContent = stats.games_played || 0;
+        document.getElementById('profile-stat-wins').textContent = stats.games_won || 0;
+        document.getElementById('profile-stat-losses').textContent = stats.games_lost || 0;
+        document.getElementById('profile-stat-winrate').textContent = `${stats.win_rate || 0}%`;
+        document.getElementById('profile-stat-lives').textContent = stats.total_lives_lost || 0;
+        document.getElementById('profile-stat-streak').textContent = stats.best_streak || 0;
+        
+        const homeGames = document.getElementById('home-stat-games');
+        const homeWins = document.getElementById('home-stat-wins');
+        const homeRate = document.getElementById('home-stat-winrate');
+        if (homeGames) homeGames.textContent = stats.games_played || 0;
+        if (homeWins) homeWins.textContent = stats.games_won || 0;
+        if (homeRate) homeRate.textContent = `${stats.win_rate || 0}%`;
+    },
+    
     async loadGameHistory() {
         if (!this.authToken) return;
         
@@ -535,39 +556,44 @@ const AuthUI = {
             });
             
             const data = await response.json();
-            const container = document.getElementById('profile-game-history');
             
-            if (data.success && data.games && data.games.length > 0) {
-                container.innerHTML = data.games.map(game => {
-                    const date = new Date(game.played_at);
-                    const isWin = game.won;
-                    
-                    return `
-                        <div class="history-item ${isWin ? 'win' : 'loss'}">
-                            <span class="history-result">${isWin ? '🏆' : '💔'}</span>
-                            <div class="history-details">
-                                <div class="history-room">${escapeHtml(game.room_name)}</div>
-                                <div class="history-meta">
-                                    ${date.toLocaleDateString('it-IT')} • 
-                                    ${game.players_count} giocatori • 
-                                    Posizione #${game.final_position}
-                                </div>
-                            </div>
-                            <div class="history-stats">
-                                <div class="history-lives">❤️ ${game.final_lives}</div>
-                                <div>${game.tricks_won} prese</div>
-                            </div>
-                        </div>
-                    `;
-                }).join('');
-            } else {
-                container.innerHTML = '<p class="empty-message">Nessuna partita giocata</p>';
-            }
+            this.renderGameHistory(data.success ? data.games : []);
         } catch (error) {
             console.error('Load history error:', error);
         }
     },
     
+    renderGameHistory(games) {
+        const container = document.getElementById('profile-game-history');
+        
+        if (games && games.length > 0) {
+            container.innerHTML = games.map(game => {
+                const date = new Date(game.played_at);
+                const isWin = game.won;
+                
+                return `
+                    <div class="history-item ${isWin ? 'win' : 'loss'}">
+                        <span class="history-result">${isWin ? '🏆' : '💔'}</span>
+                        <div class="history-details">
+                            <div class="history-room">${escapeHtml(game.room_name)}</div>
+                            <div class="history-meta">
+                                ${date.toLocaleDateString('it-IT')} • 
+                                ${game.players_count} giocatori • 
+                                Posizione #${game.final_position}
+                            </div>
+                        </div>
+                        <div class="history-stats">
+                            <div class="history-lives">❤️ ${game.final_lives}</div>
+                            <div>${game.tricks_won} prese</div>
+                        </div>
+                    </div>
+                `;
+            }).join('');
+        } else {
+            container.innerHTML = '<p class="empty-message">Nessuna partita giocata</p>';
+        }
+    },
+    
     async loadLeaderboard(category = 'wins') {
         // Update tabs
         document.querySelectorAll('.lb-tab').forEach(btn => {
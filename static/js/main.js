@@ -13,6 +13,7 @@ const App = {
     isAdmin: false,
     selectedCard: null,
     trickAdvanceScheduled: false,
+    stateVersion: null,  // state_version of gameState, the base for game_state_patch
     pendingJoinRoomId: null,
     gameStatePollInterval: null  // For polling game state when needed
 };
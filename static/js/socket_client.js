@@ -190,6 +190,7 @@ const SocketClient = {
         socket.on('room_created', (data) => {
             App.currentRoom = data.room;
             App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             // Save room to sessionStorage for rejoin after refresh
             sessionStorage.setItem('presina_room', JSON.stringify(data.room));
             // Hide rejoin banner if visible
@@ -216,6 +217,7 @@ const SocketClient = {
         socket.on('room_joined', (data) => {
             App.currentRoom = data.room;
             App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             // Save room to sessionStorage for rejoin after refresh
             sessionStorage.setItem('presina_room', JSON.stringify(data.room));
             // Hide rejoin banner if visible
@@ -235,18 +237,25 @@ const SocketClient = {
         });
         
         socket.on('player_joined', (data) => {
+            // Carries a full versioned state: the base for the next game_state_patch
+            App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             if (App.currentScreen === 'waiting-room') {
                 updateWaitingRoom(data.game_state);
             }
         });
         
         socket.on('player_left', (data) => {
+            App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             if (App.currentScreen === 'waiting-room') {
                 updateWaitingRoom(data.game_state);
             }
         });
         
         socket.on('player_kicked', (data) => {
+            App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             if (App.currentScreen === 'waiting-room') {
                 updateWaitingRoom(data.game_state);
             }
@@ -280,6 +289,7 @@ const SocketClient = {
         socket.on('rejoin_success', (data) => {
             App.currentRoom = data.room;
             App.gameState = data.game_state;
+            App.stateVersion = data.state_version ?? null;
             // Update saved room info
             sessionStorage.setItem('presina_room', JSON.stringify(data.room));
             // Hide rejoin banner if visible
@@ -310,12 +320,16 @@ const SocketClient = {
         // Game events
         socket.on('game_started', (data) => {
             App.gameState = data.game_state;
+            App.stateVersion = null;
             showScreen('game');
             GameUI.updateGameScreen(data.game_state);
             MobileUI.updateGameScreen(data.game_state);
         });
         
-        socket.on('game_state', (data) => {
+        const onGameState = (data) => {
+            // Only versioned states can be patched later
+            App.stateVersion = data.state_version ?? null;
+            
             // Save previous state before updating (needed for card play detection)
             const previousPlayerId = App.gameState?.current_player_id;
             const previousPlayer = App.gameState?.players?.find(p => p.player_id === App.playerId);
@@ -367,13 +381,16 @@ const SocketClient = {
                         isCurrentPlayerWinner
                     );
                 }
-                // After 3 seconds, advance (only one client needs to trigger this)
+                // Advance when the server-side display delay ends (the server also
+                // advances on its own; this just nudges it without waiting for a poll)
                 if (!App.trickAdvanceScheduled) {
                     App.trickAdvanceScheduled = true;
+                    const resolvesIn = data.game_state.trick_complete?.resolves_in;
+                    const delayMs = typeof resolvesIn === 'number' ? resolvesIn * 1000 : 3000;
                     setTimeout(() => {
                         App.trickAdvanceScheduled = false;
                         SocketClient.advanceTrick();
-                    }, 3000);
+                    }, delayMs);
                 }
             } else {
                 if (App.currentScreen !== 'game') {
@@ -399,6 +416,21 @@ const SocketClient = {
                 GameUI.updateGameScreen(data.game_state);
                 MobileUI.updateGameScreen(data.game_state);
             }
+        };
+        socket.on('game_state', onGameState);
+        
+        // Broadcasts only carry the top-level keys that changed since the last state
+        socket.on('game_state_patch', (data) => {
+            if (!App.gameState || App.stateVersion !== data.base) {
+                // Missed a state: fetch a full one, which becomes the new base
+                App.stateVersion = null;
+                SocketClient.requestGameState();
+                return;
+            }
+            onGameState({
+                game_state: Object.assign({}, App.gameState, data.changes),
+                state_version: data.version
+            });
         });
         
         socket.on('jolly_choice_required', (data) => {
@@ -508,7 +540,8 @@ const SocketClient = {
     makeBet(bet) {
         this.socket.emit('make_bet', {
             player_id: App.playerId,
-            bet: bet
+            bet: bet,
+            seq: App.gameState?.session_seq
         });
     },
     
@@ -517,14 +550,16 @@ const SocketClient = {
             player_id: App.playerId,
             suit: suit,
             value: value,
-            jolly_choice: jollyChoice
+            jolly_choice: jollyChoice,
+            seq: App.gameState?.session_seq
         });
     },
     
     chooseJolly(choice) {
         this.socket.emit('choose_jolly', {
             player_id: App.playerId,
-            choice: choice
+            choice: choice,
+            seq: App.gameState?.session_seq
         });
     },
     
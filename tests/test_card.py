@@ -89,6 +89,18 @@ class TestCard:
         assert jolly.get_strength() == -1
         assert jolly.get_strength() < asso_bastoni.get_strength()
     
+    def test_jolly_strength_updates_after_choice(self):
+        """Test cached strength is recomputed when the jolly choice is set."""
+        jolly = Card('Ori', 1)
+        base_strength = jolly.get_strength()
+        
+        jolly.jolly_choice = 'prende'
+        assert jolly.get_strength() == 50
+        
+        jolly.jolly_choice = 'lascia'
+        assert jolly.get_strength() == -1
+        assert base_strength == Card('Ori', 1).get_strength()
+    
     def test_jolly_choice_only_on_jolly(self):
         """Test that jolly_choice can only be set on Jolly."""
         not_jolly = Card('Bastoni', 1)
@@ -121,7 +133,32 @@ class TestCard:
         # Recreate card
         card2 = Card.from_dict(data)
         assert card == card2
-    
+
+    def test_jolly_serialization_updates_after_choice(self):
+        """Test cached to_dict is rebuilt when the jolly choice is set."""
+        jolly = Card('Ori', 1)
+        before = jolly.to_dict()
+        assert jolly.to_dict() is before
+        assert before['jolly_choice'] is None
+
+        jolly.jolly_choice = 'prende'
+        after = jolly.to_dict()
+        assert after is not before
+        assert after['jolly_choice'] == 'prende'
+        assert after['strength'] == 50
+        assert before['jolly_choice'] is None
+
+    def test_reset_clears_jolly_choice(self):
+        """Test reset makes a played jolly ready to be dealt again."""
+        jolly = Card('Ori', 1)
+        jolly.jolly_choice = 'prende'
+        jolly.to_dict()
+
+        jolly.reset()
+        assert jolly.jolly_choice is None
+        assert jolly.get_strength() == Card('Ori', 1).get_strength()
+        assert jolly.to_dict()['jolly_choice'] is None
+
     def test_card_equality(self):
         """Test card equality comparison."""
         card1 = Card('Spade', 3)
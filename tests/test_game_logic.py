@@ -140,6 +140,55 @@ class TestPresinaGame:
         
         assert success is False
     
+    def test_forbidden_bet_after_better_leaves(self):
+        """Test a removed player's bet no longer counts toward the forbidden bet."""
+        self.add_players(3)
+        self.game.start_game()
+        
+        first_better = self.game.get_current_better()
+        self.game.make_bet(first_better.player_id, 1)
+        second_better = self.game.get_current_better()
+        self.game.make_bet(second_better.player_id, 3)
+        assert self.game.get_forbidden_bet() == 1
+        
+        self.game.force_remove_player(second_better.player_id)
+        assert self.game.get_forbidden_bet() == 4
+    
+    def test_no_second_bet_after_better_leaves(self):
+        """Test a player who already bet cannot bet again when the order shifts."""
+        players = self.add_players(3)
+        self.game.start_game()
+        self.game.first_better_index = 1
+        
+        self.game.make_bet('player_1', 0)
+        self.game.force_remove_player('player_0')
+        
+        success, msg = self.game.make_bet('player_1', 1)
+        assert success is False
+        assert self.game.bets_made == {'player_1': 0}
+        assert self.game.get_current_better() is players[2]
+        
+        success, msg = self.game.make_bet('player_2', 0)
+        assert success is True
+        assert self.game.phase == GamePhase.PLAYING
+    
+    def test_stale_session_seq_rejected(self):
+        """Test actions based on an outdated session_seq are rejected."""
+        self.add_players(2)
+        self.game.start_game()
+        
+        stale_seq = self.game.session_seq
+        first = self.game.get_current_better()
+        success, msg = self.game.make_bet(first.player_id, 2, client_seq=stale_seq)
+        assert success is True
+        assert self.game.session_seq > stale_seq
+        
+        second = self.game.get_current_better()
+        success, msg = self.game.make_bet(second.player_id, 0, client_seq=stale_seq)
+        assert success is False
+        assert msg == PresinaGameOnline.RESYNC
+        assert second.bet is None
+    
     def test_transition_to_playing(self):
         """Test transition from betting to playing."""
         players = self.add_players(2)
@@ -178,6 +227,60 @@ class TestPresinaGame:
         assert success is True
         assert len(self.game.cards_on_table) == 1
     
+    def test_cards_on_table_state_follows_plays(self):
+        """Test serialized table cards are refreshed after each play."""
+        self.add_players(2)
+        self.game.start_game()
+        for _ in range(2):
+            better = self.game.get_current_better()
+            forbidden = self.game.get_forbidden_bet()
+            self.game.make_bet(better.player_id, 0 if forbidden != 0 else 1)
+        
+        assert self.game.get_state_for_player('player_0')['cards_on_table'] == []
+        
+        current_player = self.game.get_current_player()
+        card = next(c for c in current_player.hand if not c.is_jolly)
+        self.game.play_card(current_player.player_id, card.suit, card.value)
+        
+        table = self.game.get_state_for_player('player_1')['cards_on_table']
+        assert table == [(current_player.player_id, card.to_dict())]
+        assert self.game.get_state_for_player('player_0')['cards_on_table'] == table
+    
+    def test_trick_winner_starts_next_trick(self):
+        """Test the trick winner leads the following trick."""
+        self.add_players(3)
+        self.game.start_game()
+        for _ in range(3):
+            better = self.game.get_current_better()
+            forbidden = self.game.get_forbidden_bet()
+            self.game.make_bet(better.player_id, 0 if forbidden != 0 else 1)
+        
+        for _ in range(3):
+            current_player = self.game.get_current_player()
+            card = current_player.hand[0]
+            jolly = 'prende' if card.is_jolly else None
+            self.game.play_card(current_player.player_id, card.suit, card.value, jolly)
+        
+        assert self.game.phase == GamePhase.TRICK_COMPLETE
+        winner_id = self.game.trick_winner_id
+        self.game.advance_from_trick_complete()
+        assert self.game.get_current_player().player_id == winner_id
+    
+    def test_bots_chain_betting(self):
+        """Test consecutive bots all bet in a single tick."""
+        players = self.add_players(3)
+        self.game.start_game()
+        first = self.game.get_current_better()
+        for p in players:
+            if p is not first:
+                self.game.mark_as_bot(p.player_id)
+        
+        self.game.make_bet(first.player_id, 0 if self.game.get_forbidden_bet() != 0 else 1)
+        self.game.tick()
+        
+        assert self.game.phase == GamePhase.PLAYING
+        assert all(p.bet is not None for p in players)
+    
     def test_special_turn(self):
         """Test special turn detection (1 card turn)."""
         # Turn 4 (index 4) has 1 card
@@ -218,6 +321,34 @@ class TestPresinaGame:
         assert 'current_turn' in state
         assert 'cards_this_turn' in state
     
+    def test_states_for_players_show_only_own_hand(self):
+        """Test each viewer gets their own hand and not the others'."""
+        self.add_players(3)
+        self.game.start_game()
+        
+        states = self.game.get_states_for_players(['player_0', 'player_1'])
+        for viewer, state in states.items():
+            hands = {p['player_id']: p.get('hand') for p in state['players']}
+            assert len(hands.pop(viewer)) == 5
+            assert all(hand is None for hand in hands.values())
+            assert state['is_spectator'] is False
+        
+        single = self.game.get_state_for_player('player_1')
+        assert single['players'] == states['player_1']['players']
+    
+    def test_message_history_is_capped(self):
+        """Test only the latest messages are kept, each with an increasing seq."""
+        self.add_players(2)
+        for i in range(150):
+            self.game._add_message('system', f"msg {i}")
+        
+        assert len(self.game.messages) == self.game.MAX_MESSAGES
+        assert self.game.messages[-1]['content'] == "msg 149"
+        
+        sent = self.game.get_state_for_player('player_0')['messages']
+        assert len(sent) == 20
+        assert [m['seq'] for m in sent] == list(range(131, 151))
+    
     def test_get_active_players(self):
         """Test getting active (non-spectator) players."""
         players = self.add_players(3)
@@ -227,6 +358,122 @@ class TestPresinaGame:
         
         assert len(active) == 2
         assert players[1] not in active
+    
+    def test_active_players_cache_follows_membership(self):
+        """Test cached active players are refreshed on add/remove."""
+        players = self.add_players(2)
+        assert len(self.game.get_active_players()) == 2
+        
+        late = Player('late', 'Late', 'sid_late')
+        self.game.add_player(late)
+        assert late in self.game.get_active_players()
+        
+        self.game.start_game()
+        self.game.force_remove_player(players[0].player_id)
+        active = self.game.get_active_players()
+        assert players[0] not in active
+        assert len(active) == 2
+
+    
+    def test_scheduled_turn_timer(self):
+        """Test turn timer goes through the scheduler and auto-bets on expiry."""
+        scheduled = []
+        
+        class Handle:
+            cancelled = False
+            def cancel(self):
+                self.cancelled = True
+        
+        def scheduler(delay, callback):
+            handle = Handle()
+            scheduled.append((handle, callback))
+            return handle
+        
+        self.game.scheduler = scheduler
+        self.add_players(3)
+        self.game.start_game()
+        
+        handle, callback = scheduled[-1]
+        better = self.game.get_current_better()
+        assert self.game.turn_timer_player_id == better.player_id
+        assert callback() is True
+        assert better.bet is not None
+        assert handle is not scheduled[-1][0]
+        
+        # Leaving the turn phases cancels the pending timer
+        self.game._end_game()
+        assert scheduled[-1][0].cancelled
+
+    def test_scheduled_trick_advance(self):
+        """Test a completed trick is advanced by the scheduler without a client event."""
+        scheduled = []
+        
+        class Handle:
+            cancelled = False
+            def cancel(self):
+                self.cancelled = True
+        
+        def scheduler(delay, callback):
+            handle = Handle()
+            scheduled.append((delay, handle, callback))
+            return handle
+        
+        self.game.scheduler = scheduler
+        self.add_players(2)
+        self.game.start_game()
+        for _ in range(2):
+            forbidden = self.game.get_forbidden_bet()
+            self.game.make_bet(self.game.get_current_better().player_id, 0 if forbidden != 0 else 1)
+        for _ in range(2):
+            current_player = self.game.get_current_player()
+            card = current_player.hand[0]
+            jolly = 'prende' if card.is_jolly else None
+            self.game.play_card(current_player.player_id, card.suit, card.value, jolly)
+        
+        assert self.game.phase == GamePhase.TRICK_COMPLETE
+        delay, handle, callback = scheduled[-1]
+        assert delay == PresinaGameOnline.TRICK_DISPLAY_SECONDS
+        assert handle.cancelled is False
+        assert callback() is True
+        assert self.game.phase == GamePhase.PLAYING
+        assert self.game.current_trick == 1
+
+    def test_jolly_choice_keeps_trick_timer(self):
+        """Test the action tail after a jolly choice that ends the trick keeps its timer."""
+        scheduled = []
+        
+        class Handle:
+            cancelled = False
+            def cancel(self):
+                self.cancelled = True
+        
+        def scheduler(delay, callback):
+            handle = Handle()
+            scheduled.append((delay, handle))
+            return handle
+        
+        self.game.scheduler = scheduler
+        self.add_players(2)
+        self.game.start_game()
+        for _ in range(2):
+            forbidden = self.game.get_forbidden_bet()
+            self.game.make_bet(self.game.get_current_better().player_id, 0 if forbidden != 0 else 1)
+        
+        first = self.game.get_current_player()
+        first.hand = [Card('Bastoni', 2)]
+        self.game.play_card(first.player_id, 'Bastoni', 2)
+        second = self.game.get_current_player()
+        second.hand = [Card('Ori', 1)]
+        self.game.play_card(second.player_id, 'Ori', 1)
+        assert self.game.phase == GamePhase.WAITING_JOLLY
+        
+        success, msg = self.game.play_card(second.player_id, None, None, 'lascia')
+        assert success is True
+        assert self.game.phase == GamePhase.TRICK_COMPLETE
+        delay, handle = scheduled[-1]
+        assert delay == PresinaGameOnline.TRICK_DISPLAY_SECONDS
+        assert handle.cancelled is False
+        assert self.game.turn_timer_player_id is None
 
 
 class TestPlayerIntegration:
@@ -250,6 +497,48 @@ class TestPlayerIntegration:
         assert player.tricks_won == 0
         assert len(player.hand) == 0
     
+    def test_player_get_and_play_card(self):
+        """Test card lookup and removal from hand."""
+        player = Player('p1', 'Test')
+        player.receive_cards([Card('Bastoni', 1), Card('Ori', 7)])
+        
+        card = player.get_card('Ori', 7)
+        assert card == Card('Ori', 7)
+        assert player.get_card('Spade', 7) is None
+        
+        player.play_card(card)
+        assert not player.has_card('Ori', 7)
+        assert player.hand == [Card('Bastoni', 1)]
+        with pytest.raises(ValueError):
+            player.play_card(card)
+    
+    def test_player_to_dict_cache_invalidated(self):
+        """Test the cached serialization follows player changes."""
+        player = Player('p1', 'Test')
+        player.receive_cards([Card('Bastoni', 1), Card('Ori', 7)])
+        first = player.to_dict(include_hand=True)
+        assert player.to_dict(include_hand=True) is first
+        
+        player.lives = 3
+        assert player.to_dict(include_hand=True)['lives'] == 3
+        
+        player.play_card(player.get_card('Ori', 7))
+        data = player.to_dict(include_hand=True)
+        assert data['cards_in_hand'] == 1
+        assert len(data['hand']) == 1
+    
+    def test_player_to_dict_cache_kept_on_unserialized_writes(self):
+        """Test pings and socket changes don't drop the cached serialization."""
+        player = Player('p1', 'Test', 'sid1')
+        first = player.to_dict()
+        
+        player.last_activity = player.last_activity + 1
+        player.sid = 'sid2'
+        assert player.to_dict() is first
+        
+        player.is_away = True
+        assert player.to_dict()['is_away'] is True
+    
     def test_player_eliminated(self):
         """Test player elimination at 0 lives."""
         player = Player('p1', 'Test')
@@ -119,7 +119,21 @@ class TestRoomManager:
         
         assert success is True
         assert 'p1' not in room.game.players
-    
+
+    def test_leave_and_kick_forget_sent_state(self):
+        """Test removed players lose their state patch base."""
+        admin = Player('admin', 'Admin', 'sid_admin')
+        room = self.manager.create_room('Test Room', admin)
+        for pid in ('p1', 'p2'):
+            self.manager.join_room(room.room_id, Player(pid, pid, f'sid_{pid}'))
+            room.sent_states[pid] = (f'sid_{pid}', 1, {})
+
+        self.manager.leave_room('p1')
+        self.manager.kick_player('admin', 'p2')
+
+        assert 'p1' not in room.sent_states
+        assert 'p2' not in room.sent_states
+
     def test_non_admin_cannot_kick(self):
         """Test non-admin cannot kick."""
         admin = Player('admin', 'Admin', 'sid_admin')
@@ -143,7 +157,20 @@ class TestRoomManager:
         
         assert len(public) == 1
         assert public[0].name == 'Public Room'
-    
+
+    def test_public_rooms_index(self):
+        """Test private and deleted rooms are not listed in the lobby."""
+        admin1 = Player('admin1', 'Admin 1', 'sid_admin1')
+        admin2 = Player('admin2', 'Admin 2', 'sid_admin2')
+
+        public = self.manager.create_room('Public Room', admin1)
+        self.manager.create_room('Private Room', admin2, is_public=False, access_code='ABC')
+        assert self.manager.get_public_rooms() == [public]
+
+        self.manager.delete_room(public.room_id)
+        assert self.manager.get_public_rooms() == []
+        assert self.manager.search_rooms('room') == []
+
     def test_search_rooms(self):
         """Test searching rooms by name."""
         admin1 = Player('admin1', 'Admin 1', 'sid_admin1')
@@ -185,6 +212,45 @@ class TestRoomManager:
         assert success is True
         assert msg['message'] == 'Hello!'
         assert len(room.chat_messages) == 1
+
+    def test_chat_history_is_bounded(self):
+        """Test only the most recent chat messages are kept."""
+        admin = Player('admin', 'Admin', 'sid_admin')
+        room = self.manager.create_room('Test Room', admin)
+
+        for i in range(RoomManager.MAX_CHAT_MESSAGES + 5):
+            self.manager.add_chat_message(room.room_id, 'admin', f'msg {i}')
+
+        messages = list(room.chat_messages)
+        assert len(messages) == RoomManager.MAX_CHAT_MESSAGES
+        assert messages[0]['message'] == 'msg 5'
+
+    def test_cleanup_finished_room(self):
+        """Test finished rooms are removed once their shorter timeout passes."""
+        admin = Player('admin', 'Admin', 'sid_admin')
+        room = self.manager.create_room('Test Room', admin)
+
+        room.last_activity_mono -= 3600
+        assert self.manager.cleanup_stale_rooms() == 0
+
+        room.game.phase = GamePhase.GAME_OVER
+        self.manager.schedule_room_cleanup(room)
+        assert self.manager.cleanup_stale_rooms() == 1
+        assert room.room_id not in self.manager.rooms
+        assert self.manager.get_player_room('admin') is None
+
+    def test_cleanup_skips_room_with_new_activity(self):
+        """Test activity after scheduling postpones cleanup."""
+        admin = Player('admin', 'Admin', 'sid_admin')
+        room = self.manager.create_room('Test Room', admin)
+
+        room.game.phase = GamePhase.GAME_OVER
+        room.last_activity_mono -= 3600
+        self.manager.schedule_room_cleanup(room)
+        room.update_activity()
+
+        assert self.manager.cleanup_stale_rooms() == 0
+        assert room.room_id in self.manager.rooms
     
     def test_chat_message_limit(self):
         """Test chat message length limit."""